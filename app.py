@@ -1,53 +1,117 @@
 # -*- coding: utf-8 -*-
+from startup import StartupTimer
+
+# 尽早创建：启动耗时从开始导入 app 算起
+startup = StartupTimer()
+
 from flask import (
     Flask,
     request,
     render_template,
-    render_template_string,
     redirect,
     url_for,
     session,
+    abort,
+    send_from_directory,
+    stream_with_context,
+    Response,
 )
-import json, os, time
-from datetime import datetime, timezone
-from werkzeug.utils import secure_filename
-from supabase import create_client, Client
+import csv, functools, hashlib, io, json, mimetypes, os, threading, time
+from datetime import datetime, timedelta, timezone
 from flask import jsonify
-import pytz
+from werkzeug.security import safe_join
+
+import image_assets
+from http_cache import cached_response, compress_response, is_compressible
+from storage import StorageConfigError, create_storage
+from storage.base import MARKED, chunked
+from storage.fanout import FanOut
+from storage.free_groups import FreeGroupIndex
+from storage.pool_stats import PoolStats
+from storage.taken_phones import TakenPhoneIndex
+from storage.tracing import RouteStats, end_trace, resume_trace, start_trace
 
 
 # ✅ Render 专用配置（不使用 .env 文件）
 app = Flask(__name__)
-app.config["DEBUG"] = True  # 添加这一行
+# 生产环境默认关闭；本地调试设置 FLASK_DEBUG=1
+app.config["DEBUG"] = os.getenv("FLASK_DEBUG", "").lower() in ("1", "true", "yes")
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "default-secret-key")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "tw223322")
-app.config["UPLOAD_FOLDER"] = "."
+# 调试响应头 X-Storage-Trace：默认跟随 DEBUG，可用环境变量单独开关
+app.config["STORAGE_TRACE_HEADER"] = os.getenv(
+    "STORAGE_TRACE_HEADER", str(app.config["DEBUG"])
+).lower() in ("1", "true", "yes")
 
 MAX_TIMES = 3
 INTERVAL_SECONDS = 6 * 3600
-
-# 初始化 Supabase 客户端
+# 已占用号码索引只保留 Bloom 过滤器（号码量很大时降低内存）
+TAKEN_INDEX_COMPACT = os.getenv("TAKEN_INDEX_COMPACT", "").lower() in ("1", "true", "yes")
+# 同一请求内互不依赖的后端读取并发发出；0 为顺序执行
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "8"))
+fanout = FanOut(FANOUT_WORKERS)
+
+# 存储后端：supabase（默认）或 sqlite（本地离线压测）
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-# 环境变量检查
-print(f"环境变量检查:")
-print(f"SUPABASE_URL: {SUPABASE_URL}")
-print(
-    f"SUPABASE_KEY: {SUPABASE_KEY and '*****' + SUPABASE_KEY[-4:] if SUPABASE_KEY else '未设置'}"
-)
-print(f"FLASK_SECRET_KEY: {app.secret_key and '*****' + app.secret_key[-4:]}")
-print(f"ADMIN_PASSWORD: {ADMIN_PASSWORD and '*****' + ADMIN_PASSWORD[-4:]}")
 
+def print_env_check():
+    print(f"环境变量检查 (pid {os.getpid()}):")
+    print(f"STORAGE_BACKEND: {STORAGE_BACKEND}")
+    print(f"SUPABASE_URL: {SUPABASE_URL}")
+    print(
+        f"SUPABASE_KEY: {SUPABASE_KEY and '*****' + SUPABASE_KEY[-4:] if SUPABASE_KEY else '未设置'}"
+    )
+    print(f"FLASK_SECRET_KEY: {app.secret_key and '*****' + app.secret_key[-4:]}")
+    print(f"ADMIN_PASSWORD: {ADMIN_PASSWORD and '*****' + ADMIN_PASSWORD[-4:]}")
+
+
+# 存储后端与依赖它的进程内索引：每个进程在首个请求时各自创建（见 init_storage）
+storage = free_groups = taken_phones = pool_stats = None
+storage_pid = None
+storage_lock = threading.Lock()
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("致命错误: SUPABASE_URL 或 SUPABASE_KEY 未设置!")
-    exit(1)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def use_storage(backend):
+    """切换存储后端，并重建依赖它的进程内索引"""
+    global storage, free_groups, taken_phones, pool_stats, storage_pid
+    storage = backend
+    taken_phones = TakenPhoneIndex(backend, compact=TAKEN_INDEX_COMPACT)
+    free_groups = FreeGroupIndex(backend, taken_phones)
+    pool_stats = PoolStats(backend)
+    storage_pid = os.getpid()
 
 
-# ===== Supabase 工具函数 =====
+def init_storage():
+    """
+    按需创建本进程的存储后端。导入 app 时不连接后端（也不导入 supabase 客户端），
+    gunicorn preload 时 master 不持有 HTTP 客户端；fork 出的进程发现 pid 变化会自行重建，
+    不会与其他 worker 共用连接。配置缺失时抛出 StorageConfigError。
+    """
+    if storage is not None and storage_pid == os.getpid():
+        return storage
+    with storage_lock:
+        if storage is None or storage_pid != os.getpid():
+            t0 = time.perf_counter()
+            print_env_check()
+            use_storage(create_storage(STORAGE_BACKEND))
+            startup.record("storage_init", time.perf_counter() - t0)
+            startup.mark("storage_ready")
+    return storage
+
+
+def reset_after_fork():
+    """gunicorn post_fork：丢弃从 master 继承的后端客户端、索引和锁，首个请求时重建"""
+    global storage, storage_pid, storage_lock
+    storage = None
+    storage_pid = None
+    storage_lock = threading.Lock()
+    startup.reset_process()
+
+
+# ===== 工具函数 =====
 def to_epoch(v):
     """把可能是 None/float/int/str/datetime 的时间安全地转成 epoch 秒"""
     if v is None:
@@ -67,260 +131,219 @@ def to_epoch(v):
     return None
 
 
-def parse_assign_time(val):
-    """把 Supabase 取回的 assign_time 转为 datetime（带 tz）；失败返回 None"""
-    if isinstance(val, datetime):
-        return val if val.tzinfo else val.replace(tzinfo=timezone.utc)
-    if isinstance(val, (int, float)):
-        return datetime.fromtimestamp(val, tz=timezone.utc)
-    if isinstance(val, str):
-        s = val.strip()
-        if s.endswith("Z"):
-            s = s[:-1] + "+00:00"
-        try:
-            return datetime.fromisoformat(s)
-        except Exception:
-            try:
-                return datetime.strptime(s, "%Y-%m-%d %H:%M:%S").replace(
-                    tzinfo=timezone.utc
-                )
-            except Exception:
-                return None
-    return None
-
-
-def get_taken_phones():
-    """
-    全局已占用号码集合：
-    - upload_logs 中已上传的所有 phone
-    - blacklist 黑名单
-    """
-    taken = set()
-    try:
-        r1 = supabase.table("upload_logs").select("phone").execute()
-        taken.update({row["phone"] for row in (r1.data or []) if row.get("phone")})
-    except Exception as e:
-        print("读取 upload_logs 失败：", e)
-
-    try:
-        r2 = supabase.table("blacklist").select("phone").execute()
-        taken.update({row["phone"] for row in (r2.data or []) if row.get("phone")})
-    except Exception as e:
-        print("读取 blacklist 失败：", e)
-
-    return taken
-
-
-def load_whitelist():
-    response = supabase.table("whitelist").select("*").execute()
-    return [item["id"] for item in response.data]
-
-
-def get_user_assignments(uid):
-    """获取用户所有分配记录"""
-    response = supabase.table("user_assignments").select("*").eq("uid", uid).execute()
-    return [
-        {"group_id": item["group_id"], "assign_time": item["assign_time"]}
-        for item in response.data
-    ]
-
-
-def get_last_assignment(uid: str):
-    res = (
-        supabase.table("user_assignments")
-        .select("*")
-        .eq("uid", uid)
-        .order("assign_time", desc=True)
-        .limit(1)
-        .execute()
-    )
-    data = getattr(res, "data", None) or []
-    return data[0] if data else None
-
-
-def get_all_assigned_indices():
-    """获取所有已分配的组索引"""
-    response = supabase.table("user_assignments").select("group_id").execute()
-    return {item["group_id"] for item in response.data}
+ADMIN_PAGE_SIZE = 100
 
 
-def add_user_assignment(uid, group_id):
-    """添加新的分配记录（assign_time 写入 ISO8601 UTC 字符串）"""
-    now_iso = datetime.now(
-        pytz.UTC
-    ).isoformat()  # e.g. '2025-08-12T15:06:45.123456+00:00'
-    supabase.table("user_assignments").insert(
-        {"uid": uid, "group_id": group_id, "assign_time": now_iso}
-    ).execute()
+def format_upload_time(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
 
 
-def load_phone_groups():
-    response = (
-        supabase.table("phone_groups")
-        .select("group_id, phones")
-        .order("group_id")
-        .execute()
-    )
-    print("📦 Supabase 数据:", response.data)
-    groups = []
-    for item in response.data or []:
-        phones = item.get("phones")
-        if phones:
-            groups.append(phones)
-    return groups
-
+class AdminLogPage:
+    """
+    管理后台上传记录的一页：日期 / 用户筛选与 keyset 分页都在后端完成，
+    只为本页号码查询标记状态。cursor 为 "upload_time|id"。
+    prefetch() 提前在后台发出查询；groups() 在模板渲染到上传记录时取结果，之后 next_cursor 可用。
+    """
 
-def load_upload_logs():
-    logs = {}
-    try:
-        response = (
-            supabase.table("upload_logs")
-            .select("user_id, phone, upload_time")
-            .execute()
+    def __init__(self, query_date="", query_id="", cursor=""):
+        self.query_date = query_date
+        self.query_id = query_id
+        self.start = self.end = self.before = None
+        self.next_cursor = None
+        if query_date:
+            try:
+                day = datetime.strptime(query_date, "%Y-%m-%d")
+                self.start = day.strftime("%Y-%m-%d 00:00:00")
+                self.end = (day + timedelta(days=1)).strftime("%Y-%m-%d 00:00:00")
+            except ValueError:
+                pass
+        if cursor and "|" in cursor:
+            t, _, last_id = cursor.rpartition("|")
+            # 游标来自查询串：时间解析后重新格式化，无效的游标忽略（回到第一页）
+            try:
+                t = datetime.fromisoformat(t).isoformat(sep=" ")
+            except ValueError:
+                t = None
+            if t and last_id.isdigit():
+                self.before = (t, int(last_id))
+        self.rows = None
+
+    def _fetch(self):
+        return storage.page_upload_logs(
+            user_id=self.query_id or None,
+            start=self.start,
+            end=self.end,
+            before=self.before,
+            limit=ADMIN_PAGE_SIZE + 1,
         )
-        for item in sorted(
-            response.data, key=lambda x: x.get("upload_time", ""), reverse=True
-        ):
-            uid = item.get("user_id")  # ← 注意字段名要改成 Supabase 中真实存在的
-            if uid not in logs:
-                logs[uid] = []
-
-            # 获取上传时间，处理为字符串格式
-            time_value = item.get("upload_time")
-            if isinstance(time_value, datetime):
-                time_str = time_value.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                time_str = str(time_value)
 
-            logs[uid].append({"phone": item.get("phone"), "time": time_str})
-    except Exception as e:
-        print(f"❌ 加载上传记录失败: {e}")
-
-    return logs
-
-
-def load_marks():
-    response = supabase.table("mark_status").select("*").execute()
-    return {item["phone"]: item["status"] for item in response.data}
-
-
-def load_blacklist():
-    response = supabase.table("blacklist").select("phone").execute()
-    return {item["phone"] for item in response.data}
-
-
-def save_whitelist(ids):
-    # 先清空表
-    supabase.table("whitelist").delete().neq("id", "").execute()
-    # 插入新数据
-    if ids:
-        data = [{"id": id_val} for id_val in ids]
-        supabase.table("whitelist").insert(data).execute()
-
-
-def add_upload_log(uid, phone):
-    # 全局去重：该手机号一旦出现过就不能再上传（无论哪个用户）
-    existing = (
-        supabase.table("upload_logs").select("phone").eq("phone", phone).execute()
-    )
-    if existing.data:
-        print(f"已存在记录(全局): {phone}，跳过上传")
-        return False
-
-    tz = pytz.timezone("Asia/Shanghai")
-    china_time = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
+    def prefetch(self):
+        self.rows = fanout.submit(self._fetch)
+
+    def groups(self):
+        """按用户分组产出 (uid, records)，顺序同页内首次出现的顺序"""
+        rows = self.rows.result() if self.rows is not None else self._fetch()
+        if len(rows) > ADMIN_PAGE_SIZE:
+            rows = rows[:ADMIN_PAGE_SIZE]
+            last = rows[-1]
+            self.next_cursor = (
+                f"{format_upload_time(last['upload_time'])}|{last['id']}"
+            )
 
-    data = {"user_id": uid, "phone": phone, "upload_time": china_time}
-    supabase.table("upload_logs").insert(data).execute()
-    return True
+        marks = storage.get_marks(row["phone"] for row in rows if row.get("phone"))
+        logs = {}
+        for row in rows:
+            phone = row.get("phone")
+            logs.setdefault(row.get("user_id"), []).append(
+                {
+                    "phone": phone,
+                    "time": format_upload_time(row.get("upload_time")),
+                    "marked": marks.get(phone) == MARKED,
+                }
+            )
+        yield from logs.items()
 
 
-def toggle_mark(phone):
-    # 读取当前状态
-    response = supabase.table("mark_status").select("*").eq("phone", phone).execute()
-    data = response.data
+# ===== 后端调用追踪 =====
+route_stats = RouteStats()
 
-    # 默认未标记
-    current_status = "未领"
-    if data:
-        current_status = data[0]["status"]
 
-    # 切换状态
-    new_status = "已领" if current_status == "未领" else "未领"
+# 参与统计键的 action 取值；其他值不进键，避免任意表单值撑大统计表
+TRACE_ACTIONS = ("get", "upload")
 
-    # 写入 mark_status 表
-    if data:
-        supabase.table("mark_status").update({"status": new_status}).eq(
-            "phone", phone
-        ).execute()
-    else:
-        supabase.table("mark_status").insert(
-            {"phone": phone, "status": new_status}
-        ).execute()
 
-    # 黑名单操作
-    if new_status == "已领":
-        supabase.table("blacklist").insert({"phone": phone}).execute()
-    else:
-        supabase.table("blacklist").delete().eq("phone", phone).execute()
+def trace_route_key():
+    """
+    聚合用的路由名；POST / 按 action 区分领取和上传。
+    未匹配路由（404 / 405）的请求统一记为 <unmatched>：路径和方法都由客户端任意构造，不进键。
+    """
+    if request.url_rule is None:
+        return "<unmatched>"
+    key = f"{request.method} {request.url_rule.rule}"
+    action = request.form.get("action") if request.method == "POST" else None
+    if action in TRACE_ACTIONS:
+        key += f" action={action}"
+    return key
 
-    return new_status
 
+@app.before_request
+def ensure_storage():
+    request.environ["startup.request_started"] = time.perf_counter()
+    init_storage()
 
-def save_phone_groups(groups):
-    # 清空表
-    supabase.table("phone_groups").delete().neq("group_id", -1).execute()
-    # 插入新分组
-    data = [{"group_id": idx, "phones": group} for idx, group in enumerate(groups)]
-    if data:
-        supabase.table("phone_groups").insert(data).execute()
 
+@app.before_request
+def begin_storage_trace():
+    request.environ["storage.trace"] = start_trace()
 
-def save_blacklist(phones):
-    # 清空表
-    supabase.table("blacklist").delete().neq("phone", "").execute()
-    # 插入新数据
-    if phones:
-        data = [{"phone": phone} for phone in phones]
-        supabase.table("blacklist").insert(data).execute()
 
+@app.after_request
+def report_storage_trace(response):
+    trace, _ = request.environ.get("storage.trace", (None, None))
+    if trace is not None:
+        # 流式响应由 traced_stream 在输出完毕后计入统计
+        if not request.environ.get("storage.trace.deferred"):
+            route_stats.add(trace_route_key(), trace)
+        if app.config["STORAGE_TRACE_HEADER"]:
+            response.headers["X-Storage-Trace"] = trace.header_value()
+    return response
 
-def blacklist_count():
-    response = supabase.table("blacklist").select("phone", count="exact").execute()
-    return response.count
 
+app.after_request(compress_response)
 
-def blacklist_preview(n=10):
-    try:
-        response = supabase.table("blacklist").select("phone").limit(n).execute()
-        return [row["phone"] for row in response.data]
-    except Exception as e:
-        print("blacklist_preview 预览失败：", e)
-        return ["⚠️ 数据读取失败"]
 
+@app.after_request
+def report_startup(response):
+    if startup.mark("first_request"):
+        started = request.environ.get("startup.request_started")
+        if started is not None:
+            startup.record("first_request", time.perf_counter() - started)
+        print(startup.summary())
+    return response
 
-def get_remaining_phones_count():
-    # 获取所有手机号组
-    groups = load_phone_groups()
-    if not groups:
-        return 0
 
-    # 获取所有已分配的组索引
-    assigned_indices = get_all_assigned_indices()
+@app.teardown_request
+def finish_storage_trace(exc):
+    trace_state = request.environ.pop("storage.trace", None)
+    if trace_state is not None:
+        end_trace(trace_state[1])
 
-    # 计算剩余数量
-    total = sum(len(group) for group in groups)
-    assigned = sum(len(groups[i]) for i in assigned_indices if i < len(groups))
 
-    return total - assigned
+def traced_stream(chunks):
+    """
+    流式响应体在视图返回之后才生成：输出期间继续记到本请求的 trace，
+    输出完毕再计入路由统计（这部分调用不会出现在 X-Storage-Trace 响应头里）。
+    """
+    trace, _ = request.environ.get("storage.trace", (None, None))
+    if trace is None:
+        return chunks
+    request.environ["storage.trace.deferred"] = True
+    route = trace_route_key()
+
+    def generate():
+        token = resume_trace(trace)
+        try:
+            yield from chunks
+        finally:
+            end_trace(token)
+            route_stats.add(route, trace)
+
+    return generate()
+
+
+# ===== 流式导出 =====
+STREAM_CHUNK_BYTES = 16 * 1024
+
+
+def csv_stream(header, rows):
+    """把行迭代器编码成 CSV 文本块，攒够 STREAM_CHUNK_BYTES 输出一次"""
+    buf = io.StringIO()
+    buf.write("\ufeff")  # BOM：Excel 打开时按 UTF-8 识别中文
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= STREAM_CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def ndjson_stream(items):
+    """每个 dict 一行 JSON，同样按块输出"""
+    lines = []
+    size = 0
+    for item in items:
+        line = json.dumps(item, ensure_ascii=False, default=str) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_BYTES:
+            yield "".join(lines)
+            lines = []
+            size = 0
+    yield "".join(lines)
+
+
+def stream_response(body, fmt, filename):
+    """流式下载响应：body 在输出期间才逐页读取后端"""
+    if fmt == "csv":
+        mimetype = "text/csv"
+    else:
+        mimetype = "application/x-ndjson"
+    response = Response(stream_with_context(traced_stream(body)), mimetype=mimetype)
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{fmt}"'
+    )
+    return response
 
 
 # ===== 路由处理 =====
 
 
-@app.route("/ping")
-def ping_page():
-    return """
+PING_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -388,15 +411,40 @@ def ping_page():
     """
 
 
+@app.route("/ping")
+def ping_page():
+    return cached_response(PING_HTML)
+
+
 @app.route("/mark", methods=["POST"])
 def mark_phone():
     phone = request.form.get("phone")
     if not phone:
         return "No phone", 400
-    new_status = toggle_mark(phone)
+    new_status = storage.toggle_mark(phone)
     return jsonify({"status": new_status})  # 👈 返回 JSON 状态
 
 
+MARK_BATCH_LIMIT = 1000
+
+
+@app.route("/mark_batch", methods=["POST"])
+def mark_batch():
+    """批量标记：phones 为换行/逗号分隔的号码，status 为空时逐个切换"""
+    if not session.get("admin_logged_in"):
+        return "未授权", 403
+    raw = request.form.get("phones", "")
+    phones = [p.strip() for p in raw.replace(",", "\n").splitlines() if p.strip()]
+    if not phones:
+        return "No phone", 400
+    if len(phones) > MARK_BATCH_LIMIT:
+        return f"一次最多 {MARK_BATCH_LIMIT} 个号码", 400
+    status = request.form.get("status") or None
+    if status not in (None, "已领", "未领"):
+        return "无效状态", 400
+    return jsonify({"statuses": storage.set_marks(phones, status)})
+
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     message = ""
@@ -424,16 +472,6 @@ def logout():
     return redirect("/login")
 
 
-def is_date_match(record_time, target_date):
-    if not target_date:
-        return True
-    try:
-        dt = datetime.strptime(record_time, "%Y-%m-%d %H:%M:%S")
-        return dt.strftime("%Y-%m-%d") == target_date
-    except:
-        return False
-
-
 @app.route("/reset_status", methods=["POST"])
 def reset_status():
     if not session.get("admin_logged_in"):
@@ -441,987 +479,698 @@ def reset_status():
     uid = request.form.get("uid", "").strip()
     if not uid:
         return "无效 ID", 400
-    supabase.table("user_assignments").delete().eq("uid", uid).execute()
+    released = [a["group_id"] for a in storage.get_user_assignments(uid)]
+    storage.delete_user_assignments(uid)
+    free_groups.release(released)
+    pool_stats.invalidate()
     return redirect("/admin")
 
 
-@app.route("/admin", methods=["GET", "POST"])
-def admin():
-    if not session.get("admin_logged_in"):
-        return redirect("/login")
-
-    logs = load_upload_logs()
-    marks = load_marks()
+# ===== 管理后台页面 =====
+ADMIN_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>管理后台</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <style>
+        body {
+            font-family: 'Segoe UI', sans-serif;
+            background: linear-gradient(135deg, #d6c6f4, #f2e7ff);
+            margin: 0;
+            padding: 0;
+        }
+        .container {
+            max-width: 1000px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        .header {
+            background: linear-gradient(to right, #6a11cb, #2575fc);
+            color: white;
+            padding: 20px;
+            border-radius: 0 0 10px 10px;
+            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+        }
+        .card {
+            background: white;
+            padding: 20px;
+            margin: 30px 0;
+            border-radius: 10px;
+          box-shadow: 0 4px 16px rgba(0,0,0,0.08);
+        }
+        table {
+            width: 100%;
+            border-collapse: collapse;
+            margin-top: 10px;
+        }
+        th, td {
+            border: 1px solid #ddd;
+            padding: 10px;
+            text-align: left;
+        }
+        th {
+            background-color: #ede4f7;
+            font-weight: 600;
+        }
+        button {
+            padding: 8px 16px;
+            background: linear-gradient(to right, #7b2ff7, #f107a3);
+            color: white;
+            border: none;
+            border-radius: 6px;
+            cursor: pointer;
+            transition: all 0.3s ease;
+        }
+        button:hover {
+            background: linear-gradient(to right, #6a11cb, #ff6ec4);
+            transform: translateY(-1px);
+            box-shadow: 0 2px 8px rgba(0,0,0,0.15);
+        }
+        input[type="file"], input[type="text"], input[type="date"] {
+            padding: 8px;
+            border: 1px solid #bfa9d6;
+            border-radius: 6px;
+            margin-right: 10px;
+            transition: border 0.3s ease;
+        }
+        input:focus {
+            outline: none;
+            border-color: #7b2ff7;
+        }
+        a.logout {
+            color: white;
+            text-decoration: none;
+            font-size: 14px;
+            transition: opacity 0.3s;
+        }
+        a.logout:hover {
+            opacity: 0.8;
+        }
+        h2 {
+            margin-top: 0;
+            color: #5e2e91;
+        }
 
-    query_date = request.args.get("date", "")
-    query_id = request.args.get("uid", "").strip()
+        /* 剩余资料样式 */
+        .remaining-container {
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            margin-bottom: 15px;
+        }
+        .remaining-count {
+            font-size: 16px;
+            color: #333;
+        }
+        .remaining-count strong {
+            color: #7b2ff7;
+            font-size: 18px;
+        }
+        #remaining-phones {
+            background: #f8f9fa;
+            padding: 15px;
+            border-radius: 8px;
+            border: 1px dashed #d1c4e9;
+            font-family: monospace;
+            font-size: 14px;
+            max-height: 300px;
+            overflow-y: auto;
+            margin-top: 10px;
+            display: none;
+            transition: all 0.3s ease;
+        }
+        .btn-remaining {
+            padding: 6px 12px;
+            background: linear-gradient(to right, #4CAF50, #2E7D32);
+            color: white;
+            border: none;
+            border-radius: 6px;
+            cursor: pointer;
+            font-size: 14px;
+            transition: all 0.3s ease;
+        }
+        .btn-remaining:hover {
+            background: linear-gradient(to right, #3e8e41, #1B5E20);
+            transform: translateY(-1px);
+        }
 
-    # 构建管理后台 HTML
-    result_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>管理后台</title>
-        <meta name="viewport" content="width=device-width, initial-scale=1">
-        <style>
-            body {{
-                font-family: 'Segoe UI', sans-serif;
-                background: linear-gradient(135deg, #d6c6f4, #f2e7ff);
-                margin: 0;
-                padding: 0;
-            }}
-            .container {{
-                max-width: 1000px;
-                margin: 0 auto;
-                padding: 20px;
-            }}
-            .header {{
-                background: linear-gradient(to right, #6a11cb, #2575fc);
-                color: white;
-                padding: 20px;
-                border-radius: 0 0 10px 10px;
-                box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }}
-            .card {{
-                background: white;
-                padding: 20px;
-                margin: 30px 0;
-                border-radius: 10px;
-              box-shadow: 0 4px 16px rgba(0,0,0,0.08);
-            }}
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin-top: 10px;
-            }}
-            th, td {{
-                border: 1px solid #ddd;
+        /* 响应式调整 */
+        @media (max-width: 768px) {
+            .container {
                 padding: 10px;
-                text-align: left;
-            }}
-            th {{
-                background-color: #ede4f7;
-                font-weight: 600;
-            }}
-            button {{
-                padding: 8px 16px;
-                background: linear-gradient(to right, #7b2ff7, #f107a3);
-                color: white;
-                border: none;
-                border-radius: 6px;
-                cursor: pointer;
-                transition: all 0.3s ease;
-            }}
-            button:hover {{
-                background: linear-gradient(to right, #6a11cb, #ff6ec4);
-                transform: translateY(-1px);
-                box-shadow: 0 2px 8px rgba(0,0,0,0.15);
-            }}
-            input[type="file"], input[type="text"], input[type="date"] {{
-                padding: 8px;
-                border: 1px solid #bfa9d6;
-                border-radius: 6px;
-                margin-right: 10px;
-                transition: border 0.3s ease;
-            }}
-            input:focus {{
-                outline: none;
-                border-color: #7b2ff7;
-            }}
-            a.logout {{
-                color: white;
-                text-decoration: none;
-                font-size: 14px;
-                transition: opacity 0.3s;
-            }}
-            a.logout:hover {{
-                opacity: 0.8;
-            }}
-            h2 {{
-                margin-top: 0;
-                color: #5e2e91;
-            }}
-    
-            /* 剩余资料样式 */
-            .remaining-container {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                margin-bottom: 15px;
-            }}
-            .remaining-count {{
-                font-size: 16px;
-                color: #333;
-            }}
-            .remaining-count strong {{
-                color: #7b2ff7;
-                font-size: 18px;
-            }}
-            #remaining-phones {{
-                background: #f8f9fa;
+            }
+            .card {
                 padding: 15px;
-                border-radius: 8px;
-                border: 1px dashed #d1c4e9;
-                font-family: monospace;
-                font-size: 14px;
-                max-height: 300px;
-                overflow-y: auto;
+            }
+            .remaining-container {
+                flex-direction: column;
+                align-items: flex-start;
+            }
+            .btn-remaining {
                 margin-top: 10px;
-                display: none;
-                transition: all 0.3s ease;
-            }}
-            .btn-remaining {{
-                padding: 6px 12px;
-                background: linear-gradient(to right, #4CAF50, #2E7D32);
-                color: white;
-                border: none;
-                border-radius: 6px;
-                cursor: pointer;
-                font-size: 14px;
-                transition: all 0.3s ease;
-            }}
-            .btn-remaining:hover {{
-                background: linear-gradient(to right, #3e8e41, #1B5E20);
-                transform: translateY(-1px);
-            }}
-    
-            /* 响应式调整 */
-            @media (max-width: 768px) {{
-                .container {{
-                    padding: 10px;
-                }}
-                .card {{
-                    padding: 15px;
-                }}
-                .remaining-container {{
-                    flex-direction: column;
-                    align-items: flex-start;
-                }}
-                .btn-remaining {{
-                    margin-top: 10px;
-                    width: 100%;
-                }}
-            }}
-        </style>
+                width: 100%;
+            }
+        }
+    </style>
 
-        <script>
-            async function markPhone(phone) {{
-                const res = await fetch("/mark", {{
-                    method: "POST",
-                    headers: {{ "Content-Type": "application/x-www-form-urlencoded" }},
-                    body: `phone=${{phone}}`
-                }});
-
-                if (res.ok) {{
-                    const data = await res.json();
-                    const isMarked = data.status === "已领";
-                    document.getElementById(`status-${{phone}}`).innerText = isMarked ? "✅ 已领" : "❌ 未标记";
-                    const btn = document.querySelector(`button[onclick="markPhone('${{phone}}')"]`);
-                    if (btn) btn.innerText = isMarked ? "取消标记" : "标记已领";
-                }}
-            }}
-        </script>
-    </head>
-    <body>
-        <div class="header">
-            <div><strong>📊 管理后台</strong></div>
-            <div><a href="/logout" class="logout">🚪 退出</a></div>
-        </div>
-        <div class="container">
-    """
+    <script>
+        async function markPhone(phone) {
+            const res = await fetch("/mark", {
+                method: "POST",
+                headers: { "Content-Type": "application/x-www-form-urlencoded" },
+                body: `phone=${phone}`
+            });
+
+            if (res.ok) {
+                const data = await res.json();
+                const isMarked = data.status === "已领";
+                document.getElementById(`status-${phone}`).innerText = isMarked ? "✅ 已领" : "❌ 未标记";
+                const btn = document.querySelector(`button[onclick="markPhone('${phone}')"]`);
+                if (btn) btn.innerText = isMarked ? "取消标记" : "标记已领";
+            }
+        }
 
-    # 黑名单预览部分
-    result_html += f"""
-    <div class="card">
-        <p>共有 <strong>{blacklist_count()}</strong> 个手机号已被拉黑。</p>
-        <div id="blacklist-preview">
-            <ul style="font-size: 13px; margin-top: 5px; display: none;" id="blacklist-items">
-                {''.join(f'<li>{p}</li>' for p in blacklist_preview(10))}
-            </ul>
-            <button onclick="toggleBlacklist()" style="margin-top: 5px;">🔽 展开预览</button>
+        // 整个用户的号码一次标记
+        async function markAll(button, status) {
+            const table = button.closest("form").nextElementSibling;
+            const phones = Array.from(table.querySelectorAll("td[id^='status-']"))
+                .map(td => td.id.slice("status-".length));
+            if (!phones.length) return;
+            const res = await fetch("/mark_batch", {
+                method: "POST",
+                headers: { "Content-Type": "application/x-www-form-urlencoded" },
+                body: new URLSearchParams({ phones: phones.join("\\n"), status })
+            });
+            if (res.ok) {
+                const data = await res.json();
+                for (const [phone, s] of Object.entries(data.statuses)) {
+                    const isMarked = s === "已领";
+                    document.getElementById(`status-${phone}`).innerText = isMarked ? "✅ 已领" : "❌ 未标记";
+                    const btn = document.querySelector(`button[onclick="markPhone('${phone}')"]`);
+                    if (btn) btn.innerText = isMarked ? "取消标记" : "标记已领";
+                }
+            }
+        }
+    </script>
+</head>
+<body>
+    <div class="header">
+        <div><strong>📊 管理后台</strong></div>
+        <div>
+            <a href="/admin/storage_stats" class="logout">📈 后端调用统计</a>
+            &nbsp;
+            <a href="/logout" class="logout">🚪 退出</a>
         </div>
     </div>
+    <div class="container">
+
+{% set counts = stats() %}
+<div class="card">
+    <p>共有 <strong>{{ counts.blacklisted }}</strong> 个手机号已被拉黑。</p>
+    <div id="blacklist-preview">
+        <ul style="font-size: 13px; margin-top: 5px; display: none;" id="blacklist-items">
+            {% for p in blacklist_preview() %}<li>{{ p }}</li>{% endfor %}
+        </ul>
+        <button onclick="toggleBlacklist()" style="margin-top: 5px;">🔽 展开预览</button>
+    </div>
+</div>
 
-    <script>
-        function toggleBlacklist() {{
-            const list = document.getElementById("blacklist-items");
-            const btn = event.target;
-            if (list.style.display === "none") {{
-                list.style.display = "block";
-                btn.innerText = "🔼 收起预览";
-            }} else {{
-                list.style.display = "none";
-                btn.innerText = "🔽 展开预览";
-            }}
-        }}
-    </script>
-    """
-
-    result_html += f"""
-    <div class="card">
-        <div style="display: flex; justify-content: space-between; align-items: center;">
-            <p>剩余可分配手机号：<strong>{get_remaining_phones_count()}</strong> 条</p>
+<script>
+    function toggleBlacklist() {
+        const list = document.getElementById("blacklist-items");
+        const btn = event.target;
+        if (list.style.display === "none") {
+            list.style.display = "block";
+            btn.innerText = "🔼 收起预览";
+        } else {
+            list.style.display = "none";
+            btn.innerText = "🔽 展开预览";
+        }
+    }
+</script>
+<div class="card">
+    <div style="display: flex; justify-content: space-between; align-items: center;">
+        <p>
+            剩余可分配手机号：<strong>{{ counts.remaining_phones }}</strong> 条
+            （共 {{ counts.total_phones }} 条，今日上传 {{ counts.uploaded_today }} 条）
+        </p>
+        <div>
             <button onclick="showRemainingPhones()" style="padding: 6px 12px; font-size: 14px;">
                 📋 查看详情
             </button>
-        </div>
-        <div id="remaining-phones" style="display: none; margin-top: 10px; max-height: 200px; overflow-y: auto;">
-            <!-- 动态加载内容 -->
+            <a href="/get_remaining_phones?format=csv">⬇ CSV</a>
+            <a href="/get_remaining_phones?format=ndjson">⬇ NDJSON</a>
         </div>
     </div>
+    <div id="remaining-phones" style="display: none; margin-top: 10px; max-height: 200px; overflow-y: auto;">
+        <!-- 动态加载内容 -->
+    </div>
+</div>
 
-    <script>
-    function showRemainingPhones() {{
-        const container = document.getElementById('remaining-phones');
-        if (container.style.display === 'none') {{
-            fetch('/get_remaining_phones')
-                .then(res => res.json())
-                .then(data => {{
-                    container.innerHTML = data.phones.join('<br>') || '无剩余号码';
-                    container.style.display = 'block';
-                }});
-        }} else {{
-            container.style.display = 'none';
-        }}
-    }}
-    </script>
-    """
-
-    # 查询表单
-    result_html += f"""
-    <div class="card">
-        <form method="GET" style="display: flex; flex-wrap: wrap; align-items: center; gap: 15px; margin-bottom: 20px;">
-            <div>
-                <label for="date">📆 上传日期：</label>
-                <input type="date" name="date" value="{query_date}">
-            </div>
-            <div>
-                <label for="uid">🔍 用户 账号：</label>
-                <input type="text" name="uid" placeholder="请输入用户 账号" value="{query_id}">
-            </div>
-            <div>
-                <button type="submit">查找</button>
-            </div>
-        </form>
+<script>
+// 分页加载：展开时取第一页，滚动到底部附近再取下一页，逐批追加节点
+const remaining = { next: null, started: false, loading: false, done: false };
+
+function showRemainingPhones() {
+    const container = document.getElementById('remaining-phones');
+    if (container.style.display === 'none') {
+        container.style.display = 'block';
+        if (!remaining.started) {
+            remaining.started = true;
+            loadRemainingPhones();
+        }
+    } else {
+        container.style.display = 'none';
+    }
+}
 
-        <div style="max-height: 300px; overflow-y: auto; border: 1px solid #ddd; padding: 10px;">
-    """
+async function loadRemainingPhones() {
+    if (remaining.loading || remaining.done) return;
+    remaining.loading = true;
+    const container = document.getElementById('remaining-phones');
+    const params = new URLSearchParams({ limit: 500 });
+    if (remaining.next !== null) params.set('after', remaining.next);
+    try {
+        const res = await fetch('/get_remaining_phones?' + params);
+        const data = await res.json();
+        const fragment = document.createDocumentFragment();
+        for (const phone of data.phones) {
+            const row = document.createElement('div');
+            row.textContent = phone;
+            fragment.appendChild(row);
+        }
+        if (!container.childElementCount && !data.phones.length) {
+            container.textContent = '无剩余号码';
+        }
+        container.appendChild(fragment);
+        remaining.next = data.next;
+        remaining.done = data.next === null;
+    } finally {
+        remaining.loading = false;
+    }
+    // 内容还撑不出滚动条时继续加载
+    if (!remaining.done && container.scrollHeight <= container.clientHeight) {
+        loadRemainingPhones();
+    }
+}
 
-    # 显示上传记录
-    for uid, records in logs.items():
-        # 应用查询筛选
-        if query_id and uid != query_id:
-            continue
-
-        # 过滤日期匹配的记录
-        filtered_records = []
-        for record in records:
-            # 将时间值转换为日期字符串
-            time_value = record["time"]
-            if isinstance(time_value, str):
-                # 如果是字符串，提取前10个字符 (YYYY-MM-DD)
-                record_date = time_value[:10]
-            else:
-                # 如果是datetime对象，格式化为字符串
-                record_date = time_value.strftime("%Y-%m-%d")
+document.getElementById('remaining-phones').addEventListener('scroll', (e) => {
+    const c = e.target;
+    if (c.scrollTop + c.clientHeight >= c.scrollHeight - 50) loadRemainingPhones();
+});
+</script>
+<div class="card">
+    <form method="GET" style="display: flex; flex-wrap: wrap; align-items: center; gap: 15px; margin-bottom: 20px;">
+        <div>
+            <label for="date">📆 上传日期：</label>
+            <input type="date" name="date" value="{{ query_date }}">
+        </div>
+        <div>
+            <label for="uid">🔍 用户 账号：</label>
+            <input type="text" name="uid" placeholder="请输入用户 账号" value="{{ query_id }}">
+        </div>
+        <div>
+            <button type="submit">查找</button>
+        </div>
+    </form>
 
-            # 应用日期筛选
-            if not query_date or record_date == query_date:
-                filtered_records.append(record)
+    <form method="GET" action="/admin/export/upload_logs" style="display: flex; flex-wrap: wrap; align-items: center; gap: 15px; margin-bottom: 20px;">
+        <div>
+            <label>📦 导出：</label>
+            <input type="date" name="start" value="{{ query_date }}">
+            至
+            <input type="date" name="end" value="{{ query_date }}">
+        </div>
+        <div>
+            <select name="format">
+                <option value="csv" selected>CSV</option>
+                <option value="ndjson">NDJSON</option>
+            </select>
+            <input type="hidden" name="uid" value="{{ query_id }}">
+            <button type="submit">⬇ 导出上传记录</button>
+        </div>
+    </form>
 
-        if not filtered_records:
-            continue
+    <div style="max-height: 300px; overflow-y: auto; border: 1px solid #ddd; padding: 10px;">
 
-        result_html += f"""
-        <h2>用户 ID: {uid}</h2>
+        {# 上传记录：当前页，按用户分组，渲染到这里时才查询后端 #}
+        {% for uid, records in page.groups() %}
+        <h2>用户 ID: {{ uid }}</h2>
         <form method="POST" action="/reset_status" style="margin-bottom:10px;">
-            <input type="hidden" name="uid" value="{uid}">
+            <input type="hidden" name="uid" value="{{ uid }}">
             <button type="submit" onclick="return confirm('确认重置此用户的领取记录？')">🔄 重置领取记录</button>
+            <button type="button" onclick="markAll(this, '已领')">✅ 全部标记已领</button>
         </form>
-        """
-
-        result_html += (
-            "<table><tr><th>手机号</th><th>上传时间</th><th>状态</th><th>操作</th></tr>"
-        )
-        for record in filtered_records:
-            phone = record["phone"]
-            # 确保时间字符串正确显示
-            time_str = (
-                record["time"]
-                if isinstance(record["time"], str)
-                else record["time"].strftime("%Y-%m-%d %H:%M:%S")
-            )
-            mark_status = marks.get(phone, "未领")
-            is_marked = mark_status == "已领"
-            status = "✅ 已领" if is_marked else "❌ 未标记"
-            btn_text = "取消标记" if is_marked else "标记已领"
-            result_html += f"""
+        <table><tr><th>手机号</th><th>上传时间</th><th>状态</th><th>操作</th></tr>
+        {% for record in records %}
             <tr>
-                <td>{phone}</td>
-                <td>{time_str}</td>
-                <td id='status-{phone}'>{status}</td>
-                <td><button onclick="markPhone('{phone}')">{btn_text}</button></td>
+                <td>{{ record.phone }}</td>
+                <td>{{ record.time }}</td>
+                {% if record.marked %}
+                <td id='status-{{ record.phone }}'>✅ 已领</td>
+                <td><button onclick="markPhone('{{ record.phone }}')">取消标记</button></td>
+                {% else %}
+                <td id='status-{{ record.phone }}'>❌ 未标记</td>
+                <td><button onclick="markPhone('{{ record.phone }}')">标记已领</button></td>
+                {% endif %}
             </tr>
-            """
-        result_html += "</table>"
-
-    result_html += "</div></div>"  # 结束滚动区域和上传记录卡片
-
-    # 文件上传区域
-    result_html += """
-    <div class="card">
-        <h2>📤 上传新手机号库 (phones.txt)</h2>
-        <form method="POST" enctype="multipart/form-data">
-            <input type="file" name="phones" accept=".txt" required><br>
-            <button type="submit" name="upload_type" value="phones">上传手机号</button>
-        </form>
-    </div>
+        {% endfor %}
+        </table>
+        {% endfor %}
 
-    <div class="card">
-        <h2>📤 上传新白名单 (id_list.txt)</h2>
-        <form method="POST" enctype="multipart/form-data">
-            <input type="file" name="idlist" accept=".txt" required><br>
-            <button type="submit" name="upload_type" value="idlist">上传白名单</button>
-        </form>
+        {% if page.next_cursor %}
+        <p><a href="{{ url_for('admin', date=query_date or None, uid=query_id or None, before=page.next_cursor) }}">下一页 ➡</a></p>
+        {% endif %}
     </div>
+</div>
+<div class="card">
+    <h2>📤 上传新手机号库 (phones.txt)</h2>
+    <form method="POST" enctype="multipart/form-data">
+        <input type="file" name="phones" accept=".txt" required><br>
+        <select name="import_mode" style="margin: 10px 0;">
+            <option value="append" selected>追加：本文件中号码库没有的号码作为新组追加</option>
+            <option value="diff">差异同步：号码库以本文件为准，只改动有变化的组（整个文件载入内存，适合小文件）</option>
+            <option value="replace">全部替换：清空后重新编号（会使已有领取记录失效）</option>
+        </select><br>
+        <button type="submit" name="upload_type" value="phones">上传手机号</button>
+    </form>
+</div>
 
-    </body>
-    </html>
-    """
+<div class="card">
+    <h2>📤 上传新白名单 (id_list.txt)</h2>
+    <form method="POST" enctype="multipart/form-data">
+        <input type="file" name="idlist" accept=".txt" required><br>
+        <button type="submit" name="upload_type" value="idlist">上传白名单</button>
+    </form>
+</div>
+
+</body>
+</html>
+"""
+admin_template = app.jinja_env.from_string(ADMIN_TEMPLATE)
+ADMIN_STREAM_BUFFER = 16
+
+
+@app.route("/admin", methods=["GET", "POST"])
+def admin():
+    if not session.get("admin_logged_in"):
+        return redirect("/login")
 
     # 处理上传文件请求（只保留一份）
     if request.method == "POST":
         ftype = request.form.get("upload_type")
         if ftype == "phones" and "phones" in request.files:
-            file = request.files["phones"]
-            path = os.path.join(
-                app.config["UPLOAD_FOLDER"], secure_filename("phones.txt")
+            # 直接流式读取上传内容，不落盘
+            process_phones(
+                request.files["phones"].stream,
+                request.form.get("import_mode", "append"),
             )
-            file.save(path)
-            process_phones(path)
         elif ftype == "idlist" and "idlist" in request.files:
-            file = request.files["idlist"]
-            path = os.path.join(
-                app.config["UPLOAD_FOLDER"], secure_filename("id_list.txt")
-            )
-            file.save(path)
-            process_id_list(path)
+            process_id_list(request.files["idlist"].stream)
         return redirect(url_for("admin"))
 
-    return result_html
+    page = AdminLogPage(
+        request.args.get("date", ""),
+        request.args.get("uid", "").strip(),
+        request.args.get("before", ""),
+    )
+    # 计数 / 黑名单预览 / 本页记录互不依赖，先并发发出；
+    # 流式输出时页头先发给浏览器，各区块渲染到时再取结果
+    page.prefetch()
+    counts = fanout.submit(pool_stats.snapshot)
+    preview = fanout.submit(storage.blacklist_preview, 10)
+    stream = admin_template.stream(
+        page=page,
+        query_date=page.query_date,
+        query_id=page.query_id,
+        stats=counts.result,
+        blacklist_preview=preview.result,
+    )
+    stream.enable_buffering(ADMIN_STREAM_BUFFER)
+    return Response(stream_with_context(traced_stream(stream)), mimetype="text/html")
+
 
+EXPORT_COLUMNS = [
+    "upload_time",
+    "user_id",
+    "phone",
+    "status",
+    "assigned_uid",
+    "group_id",
+    "assign_time",
+]
 
-def process_id_list(file_path):
-    with open(file_path, "r") as f:
-        ids = [line.strip() for line in f if line.strip()]
-    save_whitelist(ids)
 
+def parse_day(value):
+    """YYYY-MM-DD -> datetime，空值返回 None，格式错误抛 ValueError"""
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
 
-def process_phones(file_path):
-    with open(file_path, "r") as f:
-        phones = [line.strip() for line in f if line.strip()]
-    blacklist = load_blacklist()
-    phones = [p for p in phones if p not in blacklist]  # 跳过黑名单
-    groups = []
-    for i in range(0, len(phones), 10):
-        groups.append(phones[i : i + 10])
-    save_phone_groups(groups)
 
+@app.route("/admin/export/upload_logs")
+def export_upload_logs():
+    """
+    流式导出上传记录（附标记状态与分配信息），供对账：
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD（含当天）&uid=&format=csv|ndjson
+    """
+    if not session.get("admin_logged_in"):
+        return "未授权", 403
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return "format 只支持 csv / ndjson", 400
+    try:
+        start_day = parse_day(request.args.get("start", ""))
+        end_day = parse_day(request.args.get("end", ""))
+    except ValueError:
+        return "日期格式应为 YYYY-MM-DD", 400
+    start = start_day.strftime("%Y-%m-%d 00:00:00") if start_day else None
+    end = (end_day + timedelta(days=1)).strftime("%Y-%m-%d 00:00:00") if end_day else None
+
+    rows = storage.iter_upload_log_report(
+        user_id=request.args.get("uid", "").strip() or None, start=start, end=end
+    )
+    if fmt == "csv":
+        body = csv_stream(EXPORT_COLUMNS, ([r[c] for c in EXPORT_COLUMNS] for r in rows))
+    else:
+        body = ndjson_stream(rows)
+    name = "upload_logs"
+    if start_day or end_day:
+        name += f"_{request.args.get('start', '')}_{request.args.get('end', '')}"
+    return stream_response(body, fmt, name)
+
+
+@app.route("/admin/stats")
+def admin_stats():
+    """号码池计数（进程内维护，定期对账）；?refresh=1 立即对账"""
+    if not session.get("admin_logged_in"):
+        return "未授权", 403
+    if request.args.get("refresh"):
+        pool_stats.reconcile()
+    return jsonify(pool_stats.snapshot())
+
+
+@app.route("/admin/startup")
+def admin_startup():
+    """本 worker 的启动耗时（导入 / 存储初始化 / 首个请求）"""
+    if not session.get("admin_logged_in"):
+        return "未授权", 403
+    return jsonify(startup.snapshot())
 
-# ===== 用户资料领取页面 =====
-HTML_TEMPLATE = """
+
+STORAGE_STATS_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
-    <title>兼职加人赚米</title>
+    <title>后端调用统计</title>
     <meta name="viewport" content="width=device-width, initial-scale=1">
     <style>
-  body {
-    font-family: "Helvetica Neue", sans-serif;
-    background: linear-gradient(to right, #3b0764, #1e3a8a); /* 更深更统一 */
-    color: #fff;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    flex-direction: column;
-    padding: 30px;
-  }
-
-  .top-bar {
-    position: fixed;
-    top: 0;
-    left: 0;
-    right: 0;
-    width: 100vw;
-    height: 60px;
-    background: linear-gradient(to right, #6a11cb, #2575fc);
-    color: white;
-    padding: 0 24px;
-    display: flex;
-    justify-content: space-between;
-    align-items: center;
-    z-index: 999;
-    border-bottom-left-radius: 12px;
-    border-bottom-right-radius: 12px;
-    box-sizing: border-box;
-  }
-
-  .top-bar .logo {
-    font-size: 24px;
-    margin-right: 10px;
-  }
-
-  .top-bar .title {
-    font-size: 18px;
-    font-weight: bold;
-  }
-
-  .top-bar .btn {
-    background: rgba(255, 255, 255, 0.1);
-    color: white;
-    padding: 8px 14px;
-    border-radius: 6px;
-    border: none;
-    margin-left: 12px;
-    cursor: pointer;
-  }
-
-  .top-bar .btn:hover {
-    background: rgba(255, 255, 255, 0.2);
-  }
-
-  .popup-overlay {
-    position: fixed;
-    top: 0;
-    left: 0;
-    width: 100%;
-    height: 100%;
-    background: rgba(0, 0, 0, 0.4);
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    z-index: 1000;
-  }
-
-  .popup-box {
-    background: white;
-    color: #333;  /* ✅ 加这行 */
-    padding: 20px;
-    border-radius: 10px;
-    max-width: 400px;
-    text-align: center;
-    box-shadow: 0 0 10px rgba(0, 0, 0, 0.2);
-  }
-
-  .card {
-    background: white;
-    padding: 30px;
-    border-radius: 10px;
-    box-shadow: 0 0 10px rgba(123, 47, 247, 0.2);
-    width: 90%;
-    max-width: 500px;
-    margin-bottom: 30px;
-  }
-
-  input,
-  textarea {
-    padding: 10px;
-    width: 90%;
-    margin: 10px 0;
-    font-size: 16px;
-    border: 1px solid #bfa9d6;
-    border-radius: 8px;
-  }
-
-  button {
-    padding: 12px 24px;
-    background: linear-gradient(to right, #7b2ff7, #f107a3);
-    color: white;
-    border: none;
-    border-radius: 8px;
-    font-size: 16px;
-    cursor: pointer;
-  }
-
-  button:hover {
-    background: linear-gradient(to right, #6a11cb, #ff6ec4);
-  }
-
-  .error {
-    color: #d9534f;
-    margin-top: 10px;
-  }
-
-  .success {
-    color: #5cb85c;
-    margin-top: 10px;
-  }
-
-  ul {
-    list-style: none;
-    padding: 0;
-    margin-top: 10px;
-    text-align: left;
-  }
-
-  li {
-    padding: 5px 0;
-    border-bottom: 1px dashed #ddd;
-  }
-
-  textarea {
-    height: 80px;
-    resize: vertical;
-  }
-
-  .bottom-tab-bar {
-    position: fixed;
-    bottom: 0;
-    left: 0;
-    width: 100%;
-    height: 65px;
-    background: linear-gradient(to right, #ede9fe, #f3e8ff);
-    display: flex;
-    justify-content: space-around;
-    align-items: center;
-    border-top: 1px solid #e5e7eb;
-    z-index: 999;
-  }
-
-  .tab-item {
-    display: flex;
-    flex-direction: column;
-    align-items: center;
-    text-decoration: none;
-  }
-
-  .tab-item .icon-wrapper {
-    width: 48px;
-    height: 48px;
-    border-radius: 50%;
-    background: linear-gradient(145deg, #a855f7, #6366f1);
-    display: flex;
-    justify-content: center;
-    align-items: center;
-  }
-
-  .tab-item .icon-wrapper img {
-    width: 90%;
-    height: 90%;
-    padding: 7px; /* 缩小内部图标大小一致化 */
-    object-fit: contain;
-    box-sizing: border-box;
-    display: block;
-  }
-
-  .tab-item.active .icon-wrapper {
-    background: linear-gradient(145deg, #a855f7, #6366f1);
-    /* ✅ 移除阴影效果 */
-    box-shadow: none;
-  }
-
-
-  .tab-item.active .label {
-    font-size: 13px;
-    font-weight: bold;
-    margin-top: 4px;
-    color: #a855f7;
-  }
-
-  /* ▼ 新增以下样式 ▼ */
-    .download-btn {
-        padding: 8px 12px;
-        background: #4CAF50;
-        color: white;
-        border: none;
-        border-radius: 6px;
-        font-size: 14px;
-        margin-left: 10px;
-        cursor: pointer;
-    }
-    
-    .image-popup {
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: rgba(0,0,0,0.9);
-        display: none;
-        flex-direction: column;
-        align-items: center;
-        justify-content: center;
-        z-index: 1001;
-    }
-    
-    .image-popup img {
-        max-width: 95%;
-        max-height: 70vh;
-        border: 2px solid white;
-        border-radius: 10px;
-    }
-    
-    .image-popup button {
-        padding: 10px 20px;
-        background: #7b2ff7;
-        color: white;
-        border: none;
-        border-radius: 6px;
-        font-size: 16px;
-        cursor: pointer;
-    }
-    /* ▲ 新增结束 ▲ */
-</style>
-
-
+        body { font-family: 'Segoe UI', sans-serif; padding: 20px; }
+        table { width: 100%; border-collapse: collapse; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; vertical-align: top; }
+        th { background-color: #ede4f7; }
+    </style>
 </head>
 <body>
+    <h2>📈 后端调用统计（按平均往返次数排序）</h2>
+    <p><a href="/admin">⬅ 返回管理后台</a> · <a href="?format=json">JSON</a></p>
+    <form method="POST"><button type="submit">清空统计</button></form>
+    {% if transport %}
+    {% set pool = transport.pool %}
+    <p>🔌 连接池（HTTP/2 {{ '已启用' if pool.http2 else '未启用' }}）：
+    {{ pool.open_connections }} / {{ pool.max_connections }} 个连接（空闲 {{ pool.idle_connections }}），
+    请求 {{ transport.requests }}（进行中 {{ transport.in_flight }}，峰值 {{ transport.peak_in_flight }}），
+    新建连接 {{ transport.connections_opened }}，复用率 {{ '%.0f%%' % ((transport.reuse_ratio or 0) * 100) }}，
+    重试 {{ transport.retries }}，失败 {{ transport.failures }}
+    {%- if transport.errors %}（{% for kind, n in transport.errors.items() %}{{ kind }} × {{ n }}{{ '、' if not loop.last }}{% endfor %}）{% endif %}</p>
+    {% endif %}
+    <table>
+        <tr>
+            <th>路由</th><th>请求数</th><th>往返 平均/最大</th><th>耗时ms 平均/最大</th>
+            <th>平均行数</th><th>平均 KB</th><th>表调用（每请求）</th>
+        </tr>
+        {% for r in stats %}
+        <tr>
+            <td>{{ r.route }}</td>
+            <td>{{ r.requests }}</td>
+            <td>{{ '%.1f' % r.avg_round_trips }} / {{ r.max_round_trips }}</td>
+            <td>{{ '%.1f' % r.avg_ms }} / {{ '%.1f' % r.max_ms }}</td>
+            <td>{{ '%.0f' % r.avg_rows }}</td>
+            <td>{{ '%.1f' % (r.avg_bytes / 1024) }}</td>
+            <td style="font-size: 12px;">
+                {% for key, t in r.tables.items() %}
+                {{ key }} × {{ '%.1f' % t.calls_per_request }}（{{ '%.0f' % t.rows_per_request }} 行, {{ '%.1f' % t.ms_per_request }} ms）{% if not loop.last %}<br>{% endif %}
+                {% endfor %}
+            </td>
+        </tr>
+        {% else %}
+        <tr><td colspan="7">暂无数据</td></tr>
+        {% endfor %}
+    </table>
+</body>
+</html>
+"""
+storage_stats_template = app.jinja_env.from_string(STORAGE_STATS_TEMPLATE)
 
-    <div class="top-bar">
-      <div class="left">
-        <span class="title">📱加人领奖</span>
-      </div>
-      <div class="right">
-        <button class="btn" onclick="showRules()">规则必看</button>
-        <a href="https://m.ydpc28.cc" target="_blank"><button class="btn">云顶 ➤</button></a>
-      </div>
-    </div>
-    <div style="height: 60px;"></div>  <!-- ⬅️ 跟顶部高度一致或略高 -->
-    <div class="card">
-        <h2 style="color:red; font-weight:bold;">📥 领取手机号</h2>
-        <form method="POST">
-            <input type="hidden" name="action" value="get">
-            <input name="userid" placeholder="请输入（如：ap_）您的云顶账号" required><br>
-            <button type="submit">点击领取</button>
-            <button type="button" class="download-btn" onclick="showMaterial()">下载素材</button>
-            <p style="font-size:14px; color:#666; margin-top:10px;">
-  联系让他加管理旺旺： 
-  <span id="wangwang" onclick="copyWangwang()" style="color:#007aff; text-decoration:underline; cursor:pointer;">
-    497332360
-  </span>（点击复制） 下午3点至凌晨12点在线
-</p>
-        </form>
 
-<script>
-  function copyWangwang() {
-    const text = "497332360";
-
-    // 优先使用 clipboard API（现代浏览器）
-    if (navigator.clipboard && window.isSecureContext) {
-      navigator.clipboard.writeText(text).then(() => {
-        alert("✅ 已复制旺旺号：" + text);
-      }).catch(() => {
-        fallbackCopy(text);
-      });
-    } else {
-      fallbackCopy(text);
-    }
-  }
+@app.route("/admin/storage_stats", methods=["GET", "POST"])
+def storage_stats():
+    if not session.get("admin_logged_in"):
+        return redirect("/login")
 
-  function fallbackCopy(text) {
-    const input = document.createElement("input");
-    input.value = text;
-    input.style.position = "fixed";  // 避免滚动跳动
-    input.style.opacity = 0;
-    document.body.appendChild(input);
-    input.focus();
-    input.select();
+    if request.method == "POST":
+        route_stats.reset()
+        return redirect(url_for("storage_stats"))
 
-    try {
-      const success = document.execCommand("copy");
-      alert(success ? "✅ 已复制旺旺号：" + text : "❌ 复制失败，请长按手动复制");
-    } catch (err) {
-      alert("❌ 复制失败，请长按手动复制");
-    }
+    stats = route_stats.snapshot()
+    transport = storage.transport_stats()
+    if request.args.get("format") == "json":
+        return jsonify({"routes": stats, "transport": transport})
 
-    document.body.removeChild(input);
-  }
-</script>
+    return storage_stats_template.render(stats=stats, transport=transport)
 
 
-        {% if error %}
-          <div class="error">{{ error }}</div>
-          {% if phones %}
-            <button onclick="showPopup()">📋 查看上次号码</button>
-          {% endif %}
-        {% elif phones %}
-          <div class="success">✅ 成功！！</div>
-          <button onclick="showPopup()">📋 查看</button>
-        {% endif %}
-    </div>
+def process_id_list(stream):
+    """白名单以上传文件为准，只增删有变化的 ID"""
+    return storage.sync_whitelist(iter_lines(stream))
 
-    <div class="card">
-        <h2 style="color:red; font-weight:bold;">📤 上传已成功号码</h2>
-        <form method="POST" action="/">
-            <input type="hidden" name="action" value="upload">
-            <input name="userid" placeholder="请输入您的 账号" required><br>
-            <textarea name="phones" placeholder="请粘贴手机号！\n必须是您此账号领取的\n未完成就提交将被拉黑" required></textarea><br>
-            <button type="submit">上传</button>
-            <p style="font-size:14px; color:#666; margin-top:10px;">只上传成功加了管理旺旺的号码<br>后台会自动审核任务是否完成<br>将在24小时内自动上分到你的云顶账号！<br>成功奖励38元/位</p>
-        </form>
 
-        {% if upload_msg %}
-            <div class="{{ 'success' if upload_success else 'error' }}">{{ upload_msg }}</div>
-        {% endif %}
-    </div>
+GROUP_SIZE = 10
+IMPORT_CHUNK = 1000
 
-<div id="auto-rules-popup" class="popup-overlay" style="display:none;">
-  <div class="popup-box" style="max-width: 450px; border-radius: 12px;">
-    <h3 style="color: #7b2ff7; font-size: 20px; margin-bottom: 15px; display: flex; align-items: center;">
-      <span style="margin-right: 10px;">📜</span>重复领取和上传bug已修复
-    </h3>
-    
-    <div style="max-height: 50vh; overflow-y: auto; padding-right: 10px;">
-      <p style="text-align:left; color: #555; line-height: 1.6; margin-bottom: 15px;">
-        <span style="color: #7b2ff7; font-weight: bold;">云顶玩家可以领号码加人成功一个38元</span><br>
-        <span style="font-size: 14px; color: #888;">此活动为长期 欢迎各位多多赚米</span>
-      </p>
-      
-      <ul style="padding-left: 20px; margin: 0 0 15px 0;">
-        <li style="margin-bottom: 10px; position: relative; padding-left: 25px;">
-          <span style="position: absolute; left: 0; color: #7b2ff7;">1.</span>
-          领号后通过微信/QQ/短信联系对方
-          <div style="font-size: 13px; color: #666; margin-top: 5px; padding-left: 10px;">
-            （告诉他云顶app邀请他来查福利，加管理号送，你只是通知，带他下载旺旺）
-          </div>
-        </li>
-        <li style="margin-bottom: 10px; position: relative; padding-left: 25px;">
-          <span style="position: absolute; left: 0; color: #7b2ff7;">2.</span>
-          每人可领取 <span style="color: #ff4757; font-weight: bold;">3 次</span>，每次十个号码
-          <div style="font-size: 13px; color: #666; margin-top: 5px; padding-left: 10px;">
-            （不可浪费资料，3份资料领完可联系管理再加次数）
-          </div>
-        </li>
-      </ul>
-      
-      <div style="background: #f8f9fa; padding: 12px; border-radius: 8px; margin-bottom: 15px;">
-        <p style="margin: 0; color: #555; font-size: 14px; line-height: 1.5;">
-          <span style="color: #7b2ff7;">ⓘ</span> 全程自助兼职模式，自取号码去加，成功后提交等待<br>
-          （24小时内审核自动上云顶账单，38元/位）
-        </p>
-      </div>
-    </div>
-    
-    <div style="display: flex; align-items: center; justify-content: space-between; margin-top: 15px;">
-      <div style="display: flex; align-items: center;">
-        <input type="checkbox" id="dontShowAgain" style="
-          width: 18px;
-          height: 18px;
-          accent-color: #7b2ff7;
-          cursor: pointer;
-          margin-right: 8px;
-        "> 
-        <label for="dontShowAgain" style="
-          color: #666;
-          font-size: 14px;
-          cursor: pointer;
-          user-select: none;
-        ">
-          不再显示此提示
-        </label>
-      </div>
-      
-      <button onclick="closeAutoPopup()" style="
-        padding: 8px 20px;
-        background: linear-gradient(to right, #7b2ff7, #f107a3);
-        color: white;
-        border: none;
-        border-radius: 6px;
-        font-size: 14px;
-        cursor: pointer;
-        transition: all 0.3s;
-      ">
-        我知道了
-      </button>
-    </div>
-  </div>
-</div>
 
-<!-- ✅ 弹窗结构 -->
-<div id="popup" style="display:none; position:fixed; top:0; left:0; width:100%; height:100%; background:rgba(0,0,0,0.4); z-index:999;">
-  <div style="background:white; max-width:400px; margin:100px auto; padding:20px; border-radius:10px; box-shadow:0 0 10px rgba(0,0,0,0.3); position:relative;">
-    <h3 style="color:green;">✅ 以下是您的号码</h3>
-    <pre id="popup-content" style="font-size:16px; white-space:pre-wrap; max-height:300px; overflow-y:auto;color:#000;">{% for phone in phones %}{{ phone }}{% if not loop.last %}
-{% endif %}{% endfor %}</pre>
-    <div style="text-align:right; margin-top:10px;">
-      <button onclick="copyPopupText()">📋 复制</button>
-      <button onclick="closePopup()" style="margin-left:10px;">❌ 关闭</button>
-    </div>
-  </div>
-</div>
+def iter_lines(stream):
+    """逐行读取上传的文本流（兼容 bytes / str 与 UTF-8 BOM），跳过空行"""
+    for raw in stream:
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8", errors="ignore")
+        line = raw.strip().lstrip("\ufeff")
+        if line:
+            yield line
 
-<script>
-  // 新增自动弹窗控制逻辑
-const RULES_VERSION = "2024-08-12";    // 日期标记
-
-document.addEventListener('DOMContentLoaded', function() {
-  const lastSeenVersion = localStorage.getItem('rulesVersion');
-  if(lastSeenVersion !== RULES_VERSION) {
-    document.getElementById("auto-rules-popup").style.display = "flex";
-  }
-});
 
-function closeAutoPopup() {
-  if(document.getElementById('dontShowAgain').checked) {
-    localStorage.setItem('rulesVersion', RULES_VERSION); // 存储当前版本
-  }
-  document.getElementById("auto-rules-popup").style.display = "none";
-}
-  
-  function showPopup() {
-    document.getElementById("popup").style.display = "block";
-  }
-
-  function closePopup() {
-    document.getElementById("popup").style.display = "none";
-  }
-
-  function showRules() {
-    document.getElementById("popup-rules").style.display = "flex";
-  }
-
-  function closeRulesPopup() {
-    document.getElementById("popup-rules").style.display = "none";
-  }
-
-  function copyPopupText() {
-    const content = document.getElementById("popup-content").innerText;
-
-    if (navigator.clipboard && window.isSecureContext) {
-      navigator.clipboard.writeText(content).then(() => {
-        alert("✅ 已复制");
-      }).catch(() => {
-        fallbackCopy(content);
-      });
-    } else {
-      fallbackCopy(content);
-    }
-  }
+def iter_clean_phones(phones):
+    """按块过滤已占用号码（拉黑 / 已上传），只查询已占用号码索引"""
+    for chunk in chunked(phones, IMPORT_CHUNK):
+        taken = taken_phones.find_taken(chunk)
+        yield from (p for p in chunk if p not in taken)
 
-  function fallbackCopy(text) {
-    const textarea = document.createElement("textarea");
-    textarea.value = text;
-    textarea.style.position = "fixed";
-    textarea.style.opacity = 0;
-    document.body.appendChild(textarea);
-    textarea.focus();
-    textarea.select();
 
-    try {
-      const success = document.execCommand("copy");
-      alert(success ? "✅ 已复制" : "❌ 复制失败，请长按手动复制");
-    } catch (err) {
-      alert("❌ 复制失败，请长按手动复制");
-    }
+def process_phones(stream, mode="append"):
+    """
+    流式导入号码库：逐行解析 → 过滤已占用 → 每 10 个一组 → 分批写入。
+    mode：
+    - append（默认）：剔除号码库中已有的和文件内重复的号码，其余作为新组追加到现有组号之后
+    - diff：以文件为准，保留未变化 / 已分配的组，只删改变化的组并追加新组；
+      需要把整个文件放进内存比较，只适合小文件
+    - replace：清空后从 0 重新编号（旧的 user_assignments.group_id 会失效）
+    """
+    phones = iter_clean_phones(iter_lines(stream))
+    if mode == "replace":
+        storage.save_phone_groups(chunked(phones, GROUP_SIZE))
+        free_groups.invalidate()
+    elif mode == "diff":
+        new_ids, _ = storage.sync_phone_groups(phones, GROUP_SIZE)
+        # 被删除的组在领取校验时自然剔除
+        free_groups.release(new_ids)
+    else:
+        free_groups.release(storage.append_phones(phones, GROUP_SIZE))
+    pool_stats.invalidate()
 
-    document.body.removeChild(textarea);
-  }
-</script>
 
+# ===== 静态资源指纹 =====
+ASSET_MAX_AGE = 365 * 24 * 3600
 
-<!-- 📜 任务规则弹窗 -->
-<div id="popup-rules" class="popup-overlay" style="display:none;">
-  <div class="popup-box">
-    <h3>📜 任务规则</h3>
-    <p style="text-align:left;">
-      云顶玩家可以领号码加人成功一个38元<br>此活动为长期 欢迎各位多多赚米<br><br>
-      1. 领号后微信、QQ、短信都可以去加他<br>
-      （告诉他云顶app邀请他来查福利，加管理号送，你只是通知，带他下载旺旺）<br>
-      2. 每人可领取 <b>3 次</b>，每次十个号码<br>
-        （不可浪费资料，3份资料领完可联系管理再加次数）<br><br>
-         全程自助兼职模式，自取号码去加，成功后提交等待<br>
-        （24小时内审核自动上云顶账单，38元/位）
-    </p>
-    <button onclick="closeRulesPopup()">关闭</button>
-  </div>
-</div>
 
-<!-- 图片弹窗 -->
-<div id="materialPopup" class="image-popup" style="display:none;">
-    <img src="/static/material.jpg" alt="加人素材" id="materialImage">
-    <div style="margin-top: 20px;">
-        <button onclick="downloadImage()">保存图片</button>
-        <button onclick="closeMaterialPopup()" style="margin-left: 10px;">关闭</button>
-    </div>
-    <p id="downloadHint" style="color: white; margin-top: 10px; display: none;">
-        ✅ 长按图片 → 选择"保存到相册"
-    </p>
-</div>
+@functools.lru_cache(maxsize=None)
+def asset_fingerprint(filename):
+    """static 下文件内容的短哈希（进程内缓存，部署即更新）"""
+    path = safe_join(app.static_folder, filename)
+    if path is None:
+        raise FileNotFoundError(filename)
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
 
-<script>
-    // 显示弹窗
-    function showMaterial() {
-        document.getElementById("materialPopup").style.display = "flex";
-        // 自动显示手机端操作提示
-        if (/Android|iPhone|iPad/i.test(navigator.userAgent)) {
-            document.getElementById("downloadHint").style.display = "block";
-        }
-    }
 
-    // 关闭弹窗
-    function closeMaterialPopup() {
-        document.getElementById("materialPopup").style.display = "none";
-    }
+def asset_url(filename):
+    """带内容指纹的静态资源 URL：css/index.css -> /assets/css/index.<hash>.css"""
+    root, ext = os.path.splitext(filename)
+    return f"/assets/{root}.{asset_fingerprint(filename)}{ext}"
 
-    // 下载/保存图片
-    function downloadImage() {
-        const imageUrl = document.getElementById("materialImage").src;
-        const fileName = '云顶加人素材.jpg';
-        
-        // 方法1：创建下载链接（桌面浏览器有效）
-        const link = document.createElement('a');
-        link.href = imageUrl;
-        link.download = fileName;
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
-        
-        // 方法2：提示移动端用户手动保存
-        if (/Android|iPhone|iPad/i.test(navigator.userAgent)) {
-            alert('请长按图片，然后选择"保存到相册"');
-        } else {
-            alert('图片已开始下载，请查看您的下载文件夹');
-        }
-    }
-</script>
-<!-- ▲ 新增结束 ▲ -->
 
-<div class="bottom-tab-bar">
-  <a href="/" class="tab-item active">
-    <div class="icon-wrapper">
-      <img src="/static/icons/home.png" alt="大厅">
-    </div>
-    <div class="label">加人任务</div>
-  </a>
-  <a href="/pg" class="tab-item">
-    <div class="icon-wrapper">
-      <img src="/static/icons/game.png" alt="试玩">
-    </div>
-    <div class="label">PG试玩</div>
-  </a>
-</div>
-</body>
-</html>
-"""
+app.jinja_env.globals["asset_url"] = asset_url
+
+# 图片按显示尺寸生成的 PNG / JPEG / WebP / AVIF 版本（需要 Pillow，没有时用原图）
+image_manifest = image_assets.ensure_built(app.static_folder)
+
+
+def picture(src, alt="", **attrs):
+    """模板中输出多格式、多分辨率的 <picture>，例如 {{ picture('icons/logo.png', 'logo') }}"""
+    return image_assets.picture_html(image_manifest, asset_url, src, alt, **attrs)
+
+
+app.jinja_env.globals["picture"] = picture
+
+
+@app.route("/assets/<path:name>")
+def fingerprinted_asset(name):
+    """指纹 URL 的内容永不变化，可让浏览器长期缓存"""
+    root, ext = os.path.splitext(name)
+    base, _, digest = root.rpartition(".")
+    filename = base + ext
+    try:
+        valid = bool(base) and digest == asset_fingerprint(filename)
+    except OSError:
+        valid = False
+    if not valid:
+        abort(404)
+    cache_control = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if is_compressible(mimetype):
+        # 文本资源（CSS / JS）走压缩缓存：每个编码只压缩一次
+        with open(safe_join(app.static_folder, filename), "rb") as f:
+            return cached_response(f.read(), mimetype, cache_control)
+    response = send_from_directory(app.static_folder, filename, max_age=ASSET_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
 
 
 @app.route("/pg")
 def pg_page():
-    return render_template("pg.html", active_tab="pg")
+    return cached_response(render_template("pg.html", active_tab="pg"))
 
 
 @app.route("/", methods=["GET", "POST", "HEAD"])
 def index():
     if request.method == "HEAD":
-        return "", 200
-
-    whitelist = load_whitelist()
-    groups = load_phone_groups()
-    upload_log = load_upload_logs()
+        # /ping 每 2 秒轮询一次，只确认服务已就绪，不渲染页面
+        response = app.response_class(status=200)
+        response.headers["Cache-Control"] = "no-store"
+        return response
 
+    # 按需加载：GET 不读后端；领取只查该账号的白名单和分配记录；上传只取该账号的号码组
     phones = []
     error = ""
     upload_msg = ""
@@ -1435,72 +1184,37 @@ def index():
         if action == "get":
             if not uid:
                 error = "请输入 账号"
-            elif uid not in whitelist:
-                error = "❌ 该 账号 不在名单内，请联系管理员"
             else:
-                user_assignments = get_user_assignments(uid)
-                last_assignment = get_last_assignment(uid)
-
-                # 次数上限
-                if len(user_assignments) >= MAX_TIMES:
-                    # 达上限：从白名单移除，并显示上一次的号码（如果能取到）
-                    new_whitelist = [id for id in whitelist if id != uid]
-                    save_whitelist(new_whitelist)
+                # 白名单 / 次数上限 / 冷却 / 选组 / 写分配记录 在后端一次原子完成
+                candidates = free_groups.take_candidates()
+                try:
+                    result = storage.claim_next_group(
+                        uid, MAX_TIMES, INTERVAL_SECONDS, candidates
+                    )
+                except Exception:
+                    free_groups.release(candidates)
+                    raise
+                free_groups.settle(candidates, result)
+                pool_stats.on_claim(result)
+
+                status = result.get("status")
+                if status == "not_whitelisted":
+                    error = "❌ 该 账号 不在名单内，请联系管理员"
+                elif status == "max_times":
+                    # 达上限：已从白名单移除，并显示上一次的号码（如果能取到）
                     error = "❌ 已达到最大领取次数，请联系管理员"
-                    if last_assignment and isinstance(
-                        last_assignment.get("group_id"), int
-                    ):
-                        idx = last_assignment["group_id"]
-                        if 0 <= idx < len(groups):
-                            phones = groups[idx]
+                    phones = result.get("last_phones") or []
+                elif status == "cooldown":
+                    wait_min = int(result.get("wait_seconds", 0) / 60)
+                    error = f"⏱ 请在 {wait_min} 分钟后再领取"
+                    # 展示上次号码
+                    phones = result.get("last_phones") or []
+                elif status == "exhausted":
+                    error = "❌ 资料已发放完，请联系管理员"
+                    # 如果有上一组，顺手显示一下
+                    phones = result.get("last_phones") or []
                 else:
-                    # 冷却判断（有上一次领取时间才判断）
-                    can_assign_new = True
-                    if last_assignment and last_assignment.get("assign_time"):
-                        assign_dt = parse_assign_time(last_assignment["assign_time"])
-                        if assign_dt is not None:
-                            elapsed_seconds = (
-                                datetime.now(timezone.utc) - assign_dt
-                            ).total_seconds()
-                            if elapsed_seconds < INTERVAL_SECONDS:
-                                can_assign_new = False
-                                wait_min = int(
-                                    (INTERVAL_SECONDS - elapsed_seconds) / 60
-                                )
-                                error = f"⏱ 请在 {wait_min} 分钟后再领取"
-                                # 展示上次号码
-                                if isinstance(last_assignment.get("group_id"), int):
-                                    idx = last_assignment["group_id"]
-                                    if 0 <= idx < len(groups):
-                                        phones = groups[idx]
-
-                    if can_assign_new:
-                        # 选择可用组：未被分配、且组内号码没有出现在 upload_logs/blacklist
-                        all_used_indices = get_all_assigned_indices()
-                        taken = get_taken_phones()
-
-                        selected_idx = None
-                        selected_phones = None
-                        for i, group in enumerate(groups):
-                            if i in all_used_indices:
-                                continue
-                            if group and all((p not in taken) for p in group):
-                                selected_idx = i
-                                selected_phones = group
-                                break
-
-                        if selected_idx is None:
-                            error = "❌ 资料已发放完，请联系管理员"
-                            # 如果有上一组，顺手显示一下
-                            if last_assignment and isinstance(
-                                last_assignment.get("group_id"), int
-                            ):
-                                idx = last_assignment["group_id"]
-                                if 0 <= idx < len(groups):
-                                    phones = groups[idx]
-                        else:
-                            phones = selected_phones
-                            add_user_assignment(uid, selected_idx)
+                    phones = result.get("phones") or []
 
         elif action == "upload":
             raw_data = request.form.get("phones", "").strip()
@@ -1508,19 +1222,21 @@ def index():
                 upload_msg = "❌ ID 和资料不能为空"
             else:
                 all_phones = [p.strip() for p in raw_data.splitlines() if p.strip()]
-                user_assignments = get_user_assignments(uid)
+                # 分配记录与全局去重互不依赖，并发查询
+                user_assignments, taken_global = fanout.gather(
+                    lambda: storage.get_user_assignments(uid),
+                    lambda: taken_phones.find_taken(all_phones),
+                )
 
                 if not user_assignments:
                     upload_msg = "❌ 您尚未领取任何资料"
                 else:
+                    user_groups = storage.get_phone_groups(
+                        a["group_id"] for a in user_assignments
+                    )
                     user_phones = set()
-                    for assignment in user_assignments:
-                        group_idx = assignment["group_id"]
-                        if group_idx < len(groups):
-                            user_phones.update(groups[group_idx])
-
-                            # 额外：历史全局去重（upload_logs + blacklist）
-                    taken_global = get_taken_phones()
+                    for group in user_groups.values():
+                        user_phones.update(group)
 
                     invalid_phones = []
                     duplicated_global = []
@@ -1539,36 +1255,92 @@ def index():
                     elif duplicated_global:
                         upload_msg = f"❌ 以下号码已被历史占用/拉黑: {', '.join(duplicated_global[:3])}{'...' if len(duplicated_global) > 3 else ''}"
                     else:
-                        ok = 0
-                        for phone in valid_phones:
-                            if add_upload_log(uid, phone):
-                                ok += 1
-                        upload_msg = f"✅ 成功上传 {ok} 条，将在24小时内审核自动到账"
+                        # 整批一次写入，重复号码由唯一约束跳过
+                        inserted, duplicated = storage.add_upload_logs(uid, valid_phones)
+                        upload_msg = f"✅ 成功上传 {len(inserted)} 条，将在24小时内审核自动到账"
+                        if duplicated:
+                            upload_msg += f"（{len(duplicated)} 条重复已跳过）"
                         upload_success = True
 
-    return render_template_string(
-        HTML_TEMPLATE,
+    # templates/index.html 编译一次后缓存，每次只渲染动态部分；CSS/JS 为带指纹的静态文件
+    html = render_template(
+        "index.html",
         phones=phones,
         error=error,
         upload_msg=upload_msg,
         upload_success=upload_success,
     )
+    if request.method == "GET":
+        # GET 页面内容固定：ETag 命中返回 304，压缩结果缓存复用
+        return cached_response(html)
+    # 领取 / 上传结果含个人号码，不允许缓存
+    response = app.response_class(html, mimetype="text/html")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+REMAINING_PAGE_LIMIT = 500
+REMAINING_PAGE_MAX = 5000
+
+
+def parse_remaining_cursor(value):
+    """?after= 游标："<组号>" 表示该组已取完，"<组号>:<n>" 表示该组已取前 n 个号码"""
+    gid, _, taken = (value or "").partition(":")
+    try:
+        return int(gid), max(int(taken or 0), 0)
+    except ValueError:
+        return None, 0
 
 
 @app.route("/get_remaining_phones")
 def get_remaining_phones():
-    groups = load_phone_groups()
-    if not groups:
-        return jsonify({"phones": []})
+    """
+    剩余（未分配组内的）号码：
+    - 默认分页 JSON：?after=<游标>&limit=N，每页 N 个号码（最后一页可能不足）{"phones": [...], "next": 游标或 null}
+    - ?format=ndjson / csv：流式输出全部，按页读取，内存与号码池大小无关
+    """
+    fmt = request.args.get("format", "json")
+    if fmt in ("ndjson", "csv"):
+        rows = (
+            (gid, phone)
+            for gid, group in storage.iter_unassigned_groups()
+            for phone in group
+        )
+        if fmt == "csv":
+            body = csv_stream(["group_id", "phone"], rows)
+        else:
+            body = ndjson_stream({"group_id": gid, "phone": p} for gid, p in rows)
+        return stream_response(body, fmt, "remaining_phones")
+
+    cursor_gid, skip = parse_remaining_cursor(request.args.get("after"))
+    limit = request.args.get("limit", REMAINING_PAGE_LIMIT, type=int)
+    limit = max(1, min(limit, REMAINING_PAGE_MAX))
+    # 游标停在组中间时从该组本身开始取
+    after = cursor_gid - 1 if skip else cursor_gid
+    phones = []
+    next_after = None
+    groups = storage.iter_unassigned_groups(after, page_size=limit // GROUP_SIZE + 2)
+    for gid, group in groups:
+        offset = skip if gid == cursor_gid else 0
+        room = limit - len(phones)
+        phones.extend(group[offset : offset + room])
+        if len(group) - offset > room:
+            next_after = f"{gid}:{offset + room}"
+            break
+        if len(phones) == limit:
+            next_after = str(gid)
+            break
+    return jsonify({"phones": phones, "next": next_after})
 
-    assigned_indices = get_all_assigned_indices()
-    remaining_phones = []
-    for i, group in enumerate(groups):
-        if i not in assigned_indices:
-            remaining_phones.extend(group)
-    return jsonify({"phones": remaining_phones})
+
+startup.mark("imported")
 
 
 if __name__ == "__main__":
+    try:
+        init_storage()
+    except StorageConfigError as e:
+        print(f"致命错误: {e}")
+        exit(1)
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
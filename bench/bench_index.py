@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+index() 领取 / 上传路径与管理后台压测。
+
+通过 Flask test client 对 POST / 发送 action=get 与 action=upload，并读取 GET /admin，
+后端为内存 SQLite，报告 p50/p99 延迟、每秒请求数和每请求后端往返次数。
+--latency-ms 给每次往返加上模拟网络延迟，--fanout 设置并发读取线程数（0 为顺序），
+两者配合可对比并发读取前后的路由耗时。
+
+用法：
+    python -m bench.bench_index --scale small
+    python -m bench.bench_index --scale medium --requests 100 --json bench.json
+    python -m bench.bench_index --phones 50000 --whitelist 20000 --upload-logs 0
+    python -m bench.bench_index --latency-ms 20 --fanout 0
+    python -m bench.bench_index --latency-ms 20 --fanout 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ["STORAGE_BACKEND"] = "sqlite"
+
+from bench.datasets import SCALES, build_dataset, claim_uid, upload_uid  # noqa: E402
+from storage.fanout import FanOut  # noqa: E402
+
+
+def trace_round_trips(resp):
+    """从 X-Storage-Trace 响应头解析本次请求的后端往返次数"""
+    for part in resp.headers.get("X-Storage-Trace", "").split(";"):
+        key, _, value = part.strip().partition("=")
+        if key == "calls":
+            return int(value)
+    return 0
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run_requests(client, payloads, check, send=None, route_round_trips=None):
+    """
+    send(client, payload) 发出一次请求，默认 POST /。
+    流式响应的后端调用不在响应头里，此时由 route_round_trips() 从路由统计取每请求平均往返。
+    """
+    send = send or (lambda c, data: c.post("/", data=data))
+    latencies = []
+    round_trips = []
+    failures = 0
+    started = time.perf_counter()
+    for data in payloads:
+        t0 = time.perf_counter()
+        resp = send(client, data)
+        body = resp.get_data(as_text=True)
+        latencies.append(time.perf_counter() - t0)
+        round_trips.append(trace_round_trips(resp))
+        if resp.status_code != 200 or not check(body):
+            failures += 1
+    elapsed = time.perf_counter() - started
+    if route_round_trips is not None:
+        round_trips = [route_round_trips()] * len(payloads)
+    latencies.sort()
+    n = len(payloads)
+    return {
+        "requests": n,
+        "failures": failures,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": n / elapsed if elapsed else 0.0,
+        "round_trips": sum(round_trips) / n if n else 0.0,
+    }
+
+
+def admin_round_trips(app_module):
+    for entry in app_module.route_stats.snapshot():
+        if entry["route"] == "GET /admin":
+            return entry["avg_round_trips"]
+    return 0.0
+
+
+def bench_scenario(
+    app_module, phones, whitelist, upload_logs, requests, latency_ms=0.0, fanout=None
+):
+    ds = build_dataset(phones, whitelist, upload_logs, upload_users=requests)
+    ds.storage.latency = latency_ms / 1000
+    app_module.use_storage(ds.storage)
+    if fanout is not None:
+        app_module.fanout = FanOut(fanout)
+    app_module.app.config["STORAGE_TRACE_HEADER"] = True
+    app_module.route_stats.reset()
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["admin_logged_in"] = True
+
+    claim_payloads = [
+        {"action": "get", "userid": claim_uid(i)} for i in range(requests)
+    ]
+    upload_payloads = []
+    for i in range(requests):
+        uid = upload_uid(i)
+        upload_payloads.append(
+            {
+                "action": "upload",
+                "userid": uid,
+                "phones": "\n".join(ds.group_phones(ds.upload_groups[uid])),
+            }
+        )
+
+    return {
+        "get": run_requests(client, claim_payloads, lambda b: "成功" in b),
+        "upload": run_requests(
+            client, upload_payloads, lambda b: "成功上传" in b
+        ),
+        "admin": run_requests(
+            client,
+            range(requests),
+            lambda b: "</html>" in b,
+            send=lambda c, _: c.get("/admin"),
+            route_round_trips=lambda: admin_round_trips(app_module),
+        ),
+    }
+
+
+def format_row(label, result):
+    return (
+        f"{label:<52} {result['requests']:>6} {result['failures']:>5} "
+        f"{result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f} "
+        f"{result['rps']:>9.1f} {result['round_trips']:>7.1f}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), action="append")
+    parser.add_argument("--phones", type=int)
+    parser.add_argument("--whitelist", type=int)
+    parser.add_argument("--upload-logs", type=int)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument(
+        "--latency-ms", type=float, default=0.0, help="每次后端往返的模拟网络延迟"
+    )
+    parser.add_argument("--fanout", type=int, help="并发读取线程数，0 为顺序执行")
+    parser.add_argument("--json", help="结果另存为 JSON 文件，便于与基线对比")
+    args = parser.parse_args(argv)
+
+    if args.phones is not None:
+        scenarios = [
+            (
+                "custom",
+                {
+                    "phones": args.phones,
+                    "whitelist": args.whitelist or 10_000,
+                    "upload_logs": args.upload_logs or 0,
+                },
+            )
+        ]
+    else:
+        scenarios = [(name, SCALES[name]) for name in (args.scale or ["small"])]
+
+    # 压测时屏蔽业务日志输出
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        import app as app_module
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    header = (
+        f"{'scenario':<52} {'reqs':>6} {'fail':>5} "
+        f"{'p50(ms)':>10} {'p99(ms)':>10} {'req/s':>9} {'rt/req':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    results = {}
+    for name, scale in scenarios:
+        needed = args.requests * 2
+        if scale["phones"] // 10 < needed or scale["whitelist"] < needed:
+            raise SystemExit(f"{name}: 号码组或白名单不足以支撑 {args.requests} 次请求")
+        sys.stdout = open(os.devnull, "w")
+        try:
+            result = bench_scenario(
+                app_module,
+                requests=args.requests,
+                latency_ms=args.latency_ms,
+                fanout=args.fanout,
+                **scale,
+            )
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+        label = (
+            f"{name} phones={scale['phones']} wl={scale['whitelist']} "
+            f"logs={scale['upload_logs']}"
+        )
+        for action, res in result.items():
+            print(format_row(f"{label} {action}", res))
+        results[name] = {"scale": scale, **result}
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
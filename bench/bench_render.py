@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+领取页渲染耗时对比（不含后端调用）。
+
+- inline：旧做法，每次 render_template_string 都重新解析、编译整页模板
+  （CSS / JS 内联回模板中，还原旧的页面大小）
+- cached：templates/index.html 编译一次后缓存，CSS / JS 为带指纹的静态文件
+
+用法：
+    python -m bench.bench_render
+    python -m bench.bench_render --renders 2000 --json render.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ["STORAGE_BACKEND"] = "sqlite"
+
+import app as app_module  # noqa: E402
+from flask import render_template, render_template_string  # noqa: E402
+
+CONTEXTS = {
+    "empty": {"phones": [], "error": "", "upload_msg": "", "upload_success": False},
+    "claimed": {
+        "phones": [f"1390000{i:04d}" for i in range(10)],
+        "error": "",
+        "upload_msg": "",
+        "upload_success": False,
+    },
+}
+
+
+def inline_source():
+    """把 CSS / JS 内联回模板，得到与旧 HTML_TEMPLATE 等价的整页源码"""
+    app = app_module.app
+    source, _, _ = app.jinja_env.loader.get_source(app.jinja_env, "index.html")
+    for name, tag in (
+        ("css/index.css", '<link rel="stylesheet" href="{{ asset_url(\'css/index.css\') }}">'),
+        ("js/index.js", "<script src=\"{{ asset_url('js/index.js') }}\"></script>"),
+    ):
+        with open(os.path.join(app.static_folder, name), encoding="utf-8") as f:
+            content = f.read()
+        wrapper = "style" if name.endswith(".css") else "script"
+        source = source.replace(tag, f"<{wrapper}>\n{content}</{wrapper}>")
+    return source
+
+
+def time_renders(render, renders):
+    latencies = []
+    size = 0
+    for _ in range(renders):
+        t0 = time.perf_counter()
+        html = render()
+        latencies.append(time.perf_counter() - t0)
+        size = len(html.encode("utf-8"))
+    latencies.sort()
+    return {
+        "renders": renders,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "mean_us": sum(latencies) / len(latencies) * 1e6,
+        "html_bytes": size,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--renders", type=int, default=500)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    app = app_module.app
+    source = inline_source()
+    results = []
+    with app.test_request_context("/"):
+        render_template("index.html", **CONTEXTS["empty"])  # 预热缓存
+        for ctx_name, ctx in CONTEXTS.items():
+            for mode, render in (
+                ("inline", lambda: render_template_string(source, **ctx)),
+                ("cached", lambda: render_template("index.html", **ctx)),
+            ):
+                row = time_renders(render, args.renders)
+                row.update(context=ctx_name, mode=mode)
+                results.append(row)
+
+    print(f"{'context':<10}{'mode':<8}{'renders':>9}{'p50(us)':>11}{'mean(us)':>11}{'html(B)':>10}")
+    print("-" * 59)
+    for r in results:
+        print(
+            f"{r['context']:<10}{r['mode']:<8}{r['renders']:>9}"
+            f"{r['p50_us']:>11.1f}{r['mean_us']:>11.1f}{r['html_bytes']:>10}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
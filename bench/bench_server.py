@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 部署模式压测：按 gunicorn.conf.py 启动真实服务进程，对比 sync / gthread / gevent。
+
+后端为 SQLite 文件（每种模式复制一份同样的初始数据），SQLITE_LATENCY_MS 模拟 Supabase 往返延迟；
+多个客户端线程并发 POST / action=get（白名单用户领取，重复领取走冷却分支），
+报告 p50/p99 延迟与每秒请求数。
+
+用法：
+    python -m bench.bench_server
+    python -m bench.bench_server --modes sync gthread --workers 2 --latency-ms 20
+    python -m bench.bench_server --concurrency 64 --requests 2000 --json server.json
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from bench.bench_index import percentile
+from bench.datasets import SCALES, build_dataset, claim_uid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, port, db_path, args):
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        STORAGE_BACKEND="sqlite",
+        SQLITE_PATH=db_path,
+        SQLITE_LATENCY_MS=str(args.latency_ms),
+        GUNICORN_WORKER_CLASS=mode,
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        GUNICORN_LOG_LEVEL="warning",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn ({mode}) 启动失败，退出码 {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("HEAD", "/")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    stop_server(proc)
+    raise RuntimeError(f"gunicorn ({mode}) 60 秒内未就绪")
+
+
+def stop_server(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def run_load(port, args):
+    local = threading.local()
+    users = args.users
+
+    def one(i):
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        body = urlencode({"action": "get", "userid": claim_uid(i % users)})
+        t0 = time.perf_counter()
+        try:
+            conn.request(
+                "POST",
+                "/",
+                body=body,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            )
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            local.conn = None
+            ok = False
+        return time.perf_counter() - t0, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(t for t, _ in results)
+    return {
+        "requests": len(results),
+        "failures": sum(1 for _, ok in results if not ok),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": len(results) / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=["sync", "gthread", "gevent"],
+        choices=["sync", "gthread", "gevent"],
+    )
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=32, help="客户端并发数")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=200, help="参与领取的白名单用户数")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_server_")
+    seed = os.path.join(workdir, "seed.db")
+    ds = build_dataset(path=seed, **SCALES[args.scale])
+    ds.storage.conn.close()
+
+    results = []
+    try:
+        for mode in args.modes:
+            if mode == "gevent":
+                try:
+                    import gevent  # noqa: F401
+                except ImportError:
+                    print("跳过 gevent：未安装（pip install gevent）")
+                    continue
+            db_path = os.path.join(workdir, f"{mode}.db")
+            shutil.copyfile(seed, db_path)
+            port = free_port()
+            proc = start_server(mode, port, db_path, args)
+            try:
+                row = run_load(port, args)
+            finally:
+                stop_server(proc)
+            row.update(
+                mode=mode,
+                workers=args.workers,
+                threads=args.threads if mode == "gthread" else 1,
+            )
+            results.append(row)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(
+        f"latency={args.latency_ms}ms concurrency={args.concurrency} scale={args.scale}"
+    )
+    print(
+        f"{'mode':<9}{'workers':>8}{'threads':>8}{'reqs':>7}{'fail':>6}"
+        f"{'p50(ms)':>10}{'p99(ms)':>10}{'req/s':>9}"
+    )
+    print("-" * 67)
+    for r in results:
+        print(
+            f"{r['mode']:<9}{r['workers']:>8}{r['threads']:>8}{r['requests']:>7}"
+            f"{r['failures']:>6}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['rps']:>9.1f}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
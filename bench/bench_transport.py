@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Supabase 传输层压测：SupabaseStorage 连本地假 PostgREST（bench/fake_postgrest.py），
+对比 supabase 默认客户端（default）与 http_transport 配置的客户端（pooled）。
+
+多个线程并发调用 get_user_assignments（GET），服务端注入延迟 / 503 / 断连 / 卡住，
+报告成功与失败次数、p50/p99、服务端看到的新建连接数以及重试次数。
+
+用法：
+    python -m bench.bench_transport
+    python -m bench.bench_transport --fail-rate 0.05 --drop-rate 0.02 --stall-rate 0.01
+    python -m bench.bench_transport --threads 16 --calls 2000 --json transport.json
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from supabase import create_client
+
+from bench.bench_index import percentile
+from bench.fake_postgrest import FakePostgrest
+from storage.http_transport import TransportConfig
+from storage.supabase_backend import SupabaseStorage
+
+# 假服务不校验密钥，只需要格式上像一个 JWT
+FAKE_KEY = "eyJhbGciOiJIUzI1NiJ9.e30.fake"
+
+
+def make_storage(mode, url, args):
+    if mode == "default":
+        return SupabaseStorage(create_client(url, FAKE_KEY))
+    config = TransportConfig(
+        read_timeout=args.read_timeout, retries=args.retries, max_connections=args.pool
+    )
+    return SupabaseStorage.from_credentials(url, FAKE_KEY, config)
+
+
+def run_mode(mode, args):
+    fake = FakePostgrest(
+        latency_ms=args.latency_ms,
+        fail_rate=args.fail_rate,
+        drop_rate=args.drop_rate,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+        seed=args.seed,
+    ).start()
+    try:
+        storage = make_storage(mode, fake.url, args)
+
+        def one(i):
+            t0 = time.perf_counter()
+            try:
+                storage.get_user_assignments(f"bench_{i % 100:03d}")
+                ok = True
+            except Exception:
+                ok = False
+            return time.perf_counter() - t0, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            results = list(pool.map(one, range(args.calls)))
+        elapsed = time.perf_counter() - started
+        transport = storage.transport_stats() or {}
+    finally:
+        fake.stop()
+
+    latencies = sorted(t for t, _ in results)
+    return {
+        "mode": mode,
+        "calls": len(results),
+        "failures": sum(1 for _, ok in results if not ok),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "calls_per_s": len(results) / elapsed if elapsed else 0.0,
+        "server_requests": fake.requests,
+        "server_connections": fake.connections,
+        "retries": transport.get("retries", 0),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--modes", nargs="+", default=["default", "pooled"], choices=["default", "pooled"]
+    )
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-seconds", type=float, default=5.0)
+    parser.add_argument("--read-timeout", type=float, default=1.0, help="pooled 的读超时")
+    parser.add_argument("--retries", type=int, default=2, help="pooled 的重试次数")
+    parser.add_argument("--pool", type=int, default=20, help="pooled 的最大连接数")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    results = [run_mode(mode, args) for mode in args.modes]
+
+    print(
+        f"latency={args.latency_ms}ms fail={args.fail_rate} drop={args.drop_rate} "
+        f"stall={args.stall_rate}×{args.stall_seconds}s threads={args.threads}"
+    )
+    print(
+        f"{'mode':<9}{'calls':>7}{'fail':>6}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}"
+        f"{'calls/s':>9}{'conns':>7}{'retries':>9}"
+    )
+    print("-" * 77)
+    for r in results:
+        print(
+            f"{r['mode']:<9}{r['calls']:>7}{r['failures']:>6}{r['p50_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}{r['calls_per_s']:>9.1f}"
+            f"{r['server_connections']:>7}{r['retries']:>9}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
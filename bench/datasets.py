@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+合成压测数据：直接批量写入 SQLiteStorage 的连接，避免逐条走业务接口。
+
+号码池按 10 个一组；池尾的 upload_users 个组预先分配给上传用户，
+upload_logs 使用独立号段，只放大"已占用号码"集合而不影响可领取的组。
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytz
+
+from storage import SQLiteStorage
+
+GROUP_SIZE = 10
+
+SCALES = {
+    "small": {"phones": 1_000, "whitelist": 10_000, "upload_logs": 10_000},
+    "medium": {"phones": 100_000, "whitelist": 100_000, "upload_logs": 100_000},
+    "large": {"phones": 1_000_000, "whitelist": 100_000, "upload_logs": 1_000_000},
+}
+
+
+def pool_phone(i):
+    return f"139{i:08d}"
+
+
+def logged_phone(i):
+    return f"158{i:08d}"
+
+
+def claim_uid(i):
+    return f"ap_claim_{i:06d}"
+
+
+def upload_uid(i):
+    return f"ap_upload_{i:06d}"
+
+
+class Dataset:
+    """一次压测所用的数据及其元信息"""
+
+    def __init__(self, storage, phones, whitelist, upload_logs, upload_users):
+        self.storage = storage
+        self.phones = phones
+        self.whitelist = whitelist
+        self.upload_logs = upload_logs
+        self.upload_users = upload_users
+        self.group_count = phones // GROUP_SIZE
+        # 上传用户 i 分配到的组号
+        self.upload_groups = {
+            upload_uid(i): self.group_count - upload_users + i
+            for i in range(upload_users)
+        }
+
+    def group_phones(self, group_id):
+        start = group_id * GROUP_SIZE
+        return [pool_phone(n) for n in range(start, start + GROUP_SIZE)]
+
+
+def build_dataset(phones, whitelist, upload_logs, upload_users=0, path=":memory:"):
+    if upload_users * GROUP_SIZE > phones:
+        raise ValueError("upload_users 超出号码池容量")
+    storage = SQLiteStorage(path)
+    ds = Dataset(storage, phones, whitelist, upload_logs, upload_users)
+    conn = storage.conn
+    with storage.lock, conn:
+        conn.executemany(
+            "INSERT INTO phone_groups (group_id, phones) VALUES (?, ?)",
+            (
+                (g, json.dumps(ds.group_phones(g)))
+                for g in range(ds.group_count)
+            ),
+        )
+        uids = [claim_uid(i) for i in range(max(whitelist - upload_users, 0))]
+        uids += [upload_uid(i) for i in range(upload_users)]
+        conn.executemany(
+            "INSERT INTO whitelist (id) VALUES (?)", ((uid,) for uid in uids)
+        )
+        # 分配时间设为一天前，避免冷却限制
+        assign_time = (datetime.now(pytz.UTC) - timedelta(days=1)).isoformat()
+        conn.executemany(
+            "INSERT INTO user_assignments (uid, group_id, assign_time) VALUES (?, ?, ?)",
+            ((uid, g, assign_time) for uid, g in ds.upload_groups.items()),
+        )
+        conn.executemany(
+            "INSERT INTO upload_logs (user_id, phone, upload_time) VALUES (?, ?, ?)",
+            (
+                (f"ap_hist_{i % 5000:04d}", logged_phone(i), "2025-08-01 12:00:00")
+                for i in range(upload_logs)
+            ),
+        )
+    return ds
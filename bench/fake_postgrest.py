@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+本地假 PostgREST 服务：任何路径都回应 JSON 空数组（读、写、rpc 一视同仁），
+可注入延迟和故障，用来离线验证 storage/http_transport.py 的超时、重试和连接复用。
+
+- latency_ms：每个请求的基础延迟
+- fail_rate：按概率返回 503
+- drop_rate：按概率读完请求后直接断开连接（客户端看到连接被关闭）
+- stall_rate / stall_seconds：按概率卡住 stall_seconds 秒再响应（触发读超时）
+
+用法：
+    python -m bench.fake_postgrest --port 54321 --latency-ms 20 --fail-rate 0.05
+"""
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakePostgrest:
+    def __init__(
+        self,
+        port=0,
+        latency_ms=0.0,
+        fail_rate=0.0,
+        drop_rate=0.0,
+        stall_rate=0.0,
+        stall_seconds=30.0,
+        seed=None,
+    ):
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _roll(self):
+        with self.lock:
+            self.requests += 1
+            return self.random.random()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # 响应头和响应体分两次写出，关掉 Nagle 免得叠加 40ms 的延迟确认
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with fake.lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                roll = fake._roll()
+                time.sleep(fake.latency)
+                if roll < fake.drop_rate:
+                    self.close_connection = True
+                    return
+                roll -= fake.drop_rate
+                if roll < fake.stall_rate:
+                    time.sleep(fake.stall_seconds)
+                roll -= fake.stall_rate
+                if roll < fake.fail_rate:
+                    self._send(503, {"message": "injected failure"})
+                else:
+                    self._send(200, [])
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _respond
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-seconds", type=float, default=30.0)
+    args = parser.parse_args(argv)
+    fake = FakePostgrest(
+        args.port,
+        args.latency_ms,
+        args.fail_rate,
+        args.drop_rate,
+        args.stall_rate,
+        args.stall_seconds,
+    )
+    print(f"fake PostgREST: {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 生产配置（gunicorn -c gunicorn.conf.py app:app）。
+
+请求时间主要花在等待 Supabase 上，默认的单个 sync worker 会让一次慢查询挡住所有用户，
+因此默认用 gthread：每个 worker 进程内多个线程并发等待 I/O。
+
+环境变量：
+- GUNICORN_WORKER_CLASS：gthread（默认）/ gevent（需 pip install gevent）/ sync
+- WEB_CONCURRENCY：worker 进程数，默认 min(2 × CPU + 1, GUNICORN_MAX_WORKERS)
+- GUNICORN_MAX_WORKERS：默认进程数上限（默认 4；每个进程各有一份号码索引，注意内存）
+- GUNICORN_THREADS：gthread 每进程线程数（默认 8）
+- GUNICORN_WORKER_CONNECTIONS：gevent 每进程并发连接数（默认 200）
+- GUNICORN_PRELOAD：1 时在 master 中加载应用再 fork（worker 启动更快、共享只读内存）；
+  存储客户端在各 worker 的首个请求时才创建，post_fork 丢弃从 master 继承的状态
+- GUNICORN_TIMEOUT / GUNICORN_GRACEFUL_TIMEOUT / GUNICORN_KEEPALIVE：秒
+- GUNICORN_MAX_REQUESTS / GUNICORN_MAX_REQUESTS_JITTER：处理这么多请求后重启 worker
+  （加随机抖动，避免所有 worker 同时重启）；0 为不重启
+"""
+import multiprocessing
+import os
+import sys
+
+# 注意不要用 gunicorn 设置项的名字（如 check_config）作模块级变量名
+from storage import StorageConfigError
+from storage import check_config as check_storage_config
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_flag(name, default=False):
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread").lower()
+if worker_class == "gevent":
+    try:
+        import gevent  # noqa: F401
+    except ImportError:
+        print("⚠️ 未安装 gevent，改用 gthread")
+        worker_class = "gthread"
+
+workers = env_int(
+    "WEB_CONCURRENCY",
+    min(multiprocessing.cpu_count() * 2 + 1, env_int("GUNICORN_MAX_WORKERS", 4)),
+)
+threads = env_int("GUNICORN_THREADS", 8) if worker_class == "gthread" else 1
+worker_connections = env_int("GUNICORN_WORKER_CONNECTIONS", 200)
+
+preload_app = env_flag("GUNICORN_PRELOAD")
+
+# 单个请求的上限；Supabase 调用本身的超时应小于它
+timeout = env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = env_int("GUNICORN_GRACEFUL_TIMEOUT", 20)
+keepalive = env_int("GUNICORN_KEEPALIVE", 5)
+
+max_requests = env_int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = env_int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """master 启动：配置缺失时直接退出，而不是每个 worker 在首个请求时才报错"""
+    try:
+        backend = check_storage_config()
+    except StorageConfigError as e:
+        server.log.error("致命错误: %s", e)
+        sys.exit(1)
+    if preload_app and backend == "supabase":
+        # 只导入客户端库（不建连接），fork 后各 worker 共享，省掉首个请求里的导入耗时
+        import storage.supabase_backend  # noqa: F401
+
+
+def post_fork(server, worker):
+    # preload 时 app 已在 master 中导入；未 preload 时此处 app 尚未加载，无需处理
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module.reset_after_fork()
+
+
+def post_worker_init(worker):
+    # worker 已加载应用、即将开始接受请求
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module.startup.mark("worker_ready")
+
+
+def when_ready(server):
+    server.log.info(
+        "worker_class=%s workers=%s threads=%s preload=%s",
+        worker_class,
+        workers,
+        threads,
+        preload_app,
+    )
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP 缓存与压缩层：
+
+- 强 ETag（内容 sha256）+ If-None-Match 条件请求，内容未变时返回 304、不带响应体
+- gzip / brotli 压缩（brotli 为可选依赖，未安装时只用 gzip），按 Accept-Encoding 协商，
+  不同编码各自一个 ETag，并带 Vary: Accept-Encoding
+- 不变的响应体（GET / 、/pg、/ping 页面、指纹静态资源）按内容哈希缓存压缩结果，
+  同一份内容只压缩一次；其余较大的文本响应在 after_request 中即时压缩
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+MIN_COMPRESS_SIZE = 512
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def choose_encoding(mimetype, size):
+    """按请求的 Accept-Encoding 选择编码：br 优先，其次 gzip，不压缩返回 None"""
+    if size < MIN_COMPRESS_SIZE or not is_compressible(mimetype):
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding, best=False):
+    """best=True 用最高压缩级别（只压缩一次的缓存内容），否则取速度优先的级别"""
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+class CompressedBodyCache:
+    """按内容哈希缓存各编码的压缩结果（LRU，线程安全）"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, body, encoding):
+        """返回 (etag, 对应编码的响应体)"""
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        key = (digest, encoding)
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+        if data is None:
+            data = compress(body, encoding, best=True) if encoding else body
+            with self.lock:
+                self.entries[key] = data
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        etag = f"{digest}-{encoding}" if encoding else digest
+        return etag, data
+
+
+body_cache = CompressedBodyCache()
+
+
+def cached_response(body, mimetype="text/html", cache_control="no-cache"):
+    """
+    不变内容的响应：带强 ETag，命中 If-None-Match 时返回 304；
+    压缩结果来自 body_cache。cache_control 默认 no-cache（每次用 ETag 重新验证）。
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    encoding = choose_encoding(mimetype, len(body))
+    etag, data = body_cache.get(body, encoding)
+    response = Response(data, mimetype=mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response.make_conditional(request)
+
+
+def compress_response(response):
+    """after_request：即时压缩其余较大的文本响应（流式、已编码、304 等跳过）"""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or request.method == "HEAD"
+    ):
+        return response
+    if not is_compressible(response.mimetype):
+        return response
+    data = response.get_data()
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(response.mimetype, len(data))
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+图片资源管线：按页面上的显示尺寸生成缩小的 PNG / JPEG 以及 WebP / AVIF 版本，
+模板里用 picture() 输出 <picture>，浏览器挑支持的最小格式和合适的分辨率。
+
+- 构建：python -m image_assets（部署构建时执行），输出到 static/build/，
+  清单为 static/build/manifest.json，记录源图哈希和各版本
+- 启动时清单缺失或源图已变化、且装了 Pillow 时自动重新生成；没有 Pillow 时退回原图
+- URL 走 asset_url 的内容指纹（/assets/...<hash>.webp），可长期 immutable 缓存
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+from markupsafe import Markup, escape
+
+try:
+    from PIL import Image, features
+except ImportError:  # 可选依赖
+    Image = None
+
+BUILD_DIR = "build"
+MANIFEST = "manifest.json"
+
+# 源图（相对 static）-> 显示尺寸：
+# width 为固定显示宽度（CSS px），按 densities 生成 1x/2x/3x；
+# widths 为响应式宽度档位（px），配合 sizes 使用
+IMAGES = {
+    "icons/logo.png": {"width": 30, "densities": (1, 2, 3)},
+    "icons/home.png": {"width": 32, "densities": (1, 2, 3)},
+    "icons/game.png": {"width": 32, "densities": (1, 2, 3)},
+    "material.jpg": {"widths": (480, 853), "sizes": "95vw"},
+}
+
+# 现代格式在前，浏览器取第一个支持的 <source>
+MODERN_FORMATS = (
+    ("avif", "image/avif", {"quality": 55}),
+    ("webp", "image/webp", {"quality": 82, "method": 6}),
+)
+FALLBACK_FORMATS = {
+    ".png": ("png", {"optimize": True}),
+    ".jpg": ("jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+    ".jpeg": ("jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def available_formats():
+    if Image is None:
+        return ()
+    return tuple(fmt for fmt in MODERN_FORMATS if features.check(fmt[0]))
+
+
+def _save(image, path, fmt, options):
+    """先写临时文件再替换，多个 worker 同时构建也不会读到半个文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp, format=fmt, **options)
+    os.replace(tmp, path)
+
+
+def _copy(source, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, path)
+
+
+def build_image(static_folder, src, spec):
+    """为一张源图生成全部版本，返回清单条目"""
+    source_path = os.path.join(static_folder, src)
+    stem, ext = os.path.splitext(src)
+    fallback_fmt, fallback_options = FALLBACK_FORMATS[ext.lower()]
+
+    with Image.open(source_path) as original:
+        original.load()
+        has_alpha = original.mode in ("RGBA", "LA", "P")
+        base = original.convert("RGBA" if has_alpha else "RGB")
+
+    if "widths" in spec:
+        targets = [(w, f"{w}w") for w in spec["widths"]]
+        display_width = spec["widths"][-1]
+    else:
+        targets = [(spec["width"] * d, f"{d}x") for d in spec["densities"]]
+        display_width = spec["width"]
+    display_height = round(display_width * base.height / base.width)
+
+    variants = {}
+    for target_width, descriptor in targets:
+        width = min(target_width, base.width)
+        height = round(width * base.height / base.width)
+        resized = base.resize((width, height), Image.LANCZOS)
+        outputs = [(ext.lstrip(".").lower(), None, fallback_fmt, fallback_options)]
+        outputs += [(n, mime, n.upper(), opts) for n, mime, opts in available_formats()]
+        for suffix, mime, fmt, options in outputs:
+            rel = f"{BUILD_DIR}/{stem}-{width}.{suffix}"
+            if mime is None and width == base.width:
+                # 原尺寸的原格式版本：重新编码不会更小，直接复制源文件
+                _copy(source_path, os.path.join(static_folder, rel))
+            else:
+                _save(resized, os.path.join(static_folder, rel), fmt, options)
+            variants.setdefault(suffix, {"type": mime, "srcset": []})
+            variants[suffix]["srcset"].append([rel, descriptor])
+
+    return {
+        "source_hash": file_hash(source_path),
+        "width": display_width,
+        "height": display_height,
+        "sizes": spec.get("sizes"),
+        "fallback": ext.lstrip(".").lower(),
+        "variants": variants,
+    }
+
+
+def manifest_path(static_folder):
+    return os.path.join(static_folder, BUILD_DIR, MANIFEST)
+
+
+def load_manifest(static_folder):
+    try:
+        with open(manifest_path(static_folder), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build(static_folder, force=False):
+    """生成（或补齐）全部图片版本并写清单；返回清单"""
+    manifest = load_manifest(static_folder)
+    changed = False
+    for src, spec in IMAGES.items():
+        source_path = os.path.join(static_folder, src)
+        if not os.path.exists(source_path):
+            continue
+        entry = manifest.get(src)
+        if not force and entry and entry.get("source_hash") == file_hash(source_path):
+            continue
+        manifest[src] = build_image(static_folder, src, spec)
+        changed = True
+    if changed:
+        path = manifest_path(static_folder)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    return manifest
+
+
+def ensure_built(static_folder):
+    """启动时调用：有 Pillow 则补齐过期版本，否则只读已有清单"""
+    if Image is None:
+        return load_manifest(static_folder)
+    try:
+        return build(static_folder)
+    except OSError as e:
+        print(f"⚠️ 图片版本生成失败，使用原图: {e}")
+        return load_manifest(static_folder)
+
+
+def picture_html(manifest, asset_url, src, alt="", **attrs):
+    """
+    输出 <picture>：AVIF / WebP <source> + 缩小后的原格式 <img>。
+    清单里没有该图（未构建）时直接输出原图 <img>。
+    attrs 原样作为 <img> 属性（如 id、class），属性名里的 _ 转成 -。
+    """
+    img_attrs = {"alt": alt}
+    entry = manifest.get(src)
+    if not entry:
+        img_attrs["src"] = asset_url(src)
+        return Markup(f"<img {_attrs(img_attrs, attrs)}>")
+
+    def srcset(variant):
+        return ", ".join(f"{asset_url(rel)} {d}" for rel, d in variant["srcset"])
+
+    sources = []
+    for name, mime, _ in MODERN_FORMATS:
+        variant = entry["variants"].get(name)
+        if variant:
+            source = {"type": mime, "srcset": srcset(variant)}
+            if entry.get("sizes"):
+                source["sizes"] = entry["sizes"]
+            sources.append(f"<source {_attrs(source, {})}>")
+    fallback = entry["variants"][entry["fallback"]]
+    # 不支持 srcset 的浏览器：固定尺寸图取 1x，响应式图取最大档（也是"保存图片"下载的那张）
+    fallback_src = fallback["srcset"][-1 if entry.get("sizes") else 0][0]
+    img_attrs.update(
+        src=asset_url(fallback_src),
+        srcset=srcset(fallback),
+        decoding="async",
+    )
+    if entry.get("sizes"):
+        # 响应式图片由 CSS 的 max-width / max-height 决定大小，不写死宽高
+        img_attrs["sizes"] = entry["sizes"]
+    else:
+        img_attrs.update(width=entry["width"], height=entry["height"])
+    # display: contents 让 <img> 仍按原来的父元素布局，原有 CSS 选择器不受影响
+    return Markup(
+        '<picture style="display: contents">'
+        + "".join(sources)
+        + f"<img {_attrs(img_attrs, attrs)}>"
+        + "</picture>"
+    )
+
+
+def _attrs(base, extra):
+    merged = dict(base)
+    merged.update({k.replace("_", "-"): v for k, v in extra.items()})
+    return " ".join(f'{k}="{escape(v)}"' for k, v in merged.items() if v is not None)
+
+
+if __name__ == "__main__":
+    if Image is None:
+        sys.exit("需要 Pillow：pip install Pillow")
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    result = build(folder, force="--force" in sys.argv)
+    for src, entry in result.items():
+        for name, variant in entry["variants"].items():
+            for rel, descriptor in variant["srcset"]:
+                size = os.path.getsize(os.path.join(folder, rel))
+                print(f"{src:<18} {name:<5} {descriptor:<5} {size:>8} B  {rel}")
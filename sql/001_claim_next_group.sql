@@ -0,0 +1,125 @@
+-- 原子领取：在一个事务里完成 白名单 / 次数上限 / 冷却 / 选组 / 写分配记录，
+-- 通过 supabase.rpc("claim_next_group", {...}) 一次往返调用。
+--
+-- 所有领取串行于同一个事务级 advisory lock，避免两个 worker 把同一组发给不同用户。
+-- p_candidates 为应用进程内空闲组索引给出的候选组号（按顺序优先），
+-- 全部不可用时回退到按 group_id 顺序查找第一个可用组。
+-- phones 列兼容 text[] 与 jsonb 两种类型。
+
+create or replace function claim_next_group(
+    p_uid text,
+    p_max_times int,
+    p_interval_seconds int,
+    p_candidates int[] default '{}'
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_count int;
+    v_last_group int;
+    v_last_time timestamptz;
+    v_last_phones jsonb;
+    v_group int;
+    v_phones jsonb;
+    v_elapsed double precision;
+begin
+    perform pg_advisory_xact_lock(hashtext('claim_next_group'));
+
+    if not exists (select 1 from whitelist where id = p_uid) then
+        return jsonb_build_object('status', 'not_whitelisted');
+    end if;
+
+    select count(*) into v_count from user_assignments where uid = p_uid;
+
+    select a.group_id, a.assign_time::timestamptz
+      into v_last_group, v_last_time
+      from user_assignments a
+     where a.uid = p_uid
+     order by a.assign_time::timestamptz desc
+     limit 1;
+
+    if v_last_group is not null then
+        select to_jsonb(g.phones) into v_last_phones
+          from phone_groups g where g.group_id = v_last_group;
+    end if;
+
+    -- 次数上限：从白名单移除
+    if v_count >= p_max_times then
+        delete from whitelist where id = p_uid;
+        return jsonb_build_object(
+            'status', 'max_times',
+            'last_group_id', v_last_group,
+            'last_phones', coalesce(v_last_phones, '[]'::jsonb)
+        );
+    end if;
+
+    -- 冷却
+    if v_last_time is not null then
+        v_elapsed := extract(epoch from (now() - v_last_time));
+        if v_elapsed < p_interval_seconds then
+            return jsonb_build_object(
+                'status', 'cooldown',
+                'wait_seconds', p_interval_seconds - v_elapsed,
+                'last_group_id', v_last_group,
+                'last_phones', coalesce(v_last_phones, '[]'::jsonb)
+            );
+        end if;
+    end if;
+
+    -- 选组：未分配，且组内号码未出现在 upload_logs / blacklist
+    select g.group_id, to_jsonb(g.phones)
+      into v_group, v_phones
+      from phone_groups g
+      left join unnest(coalesce(p_candidates, '{}')) with ordinality c(group_id, pos)
+        on c.group_id = g.group_id
+     where (cardinality(coalesce(p_candidates, '{}')) = 0 or c.group_id is not null)
+       and jsonb_array_length(to_jsonb(g.phones)) > 0
+       and not exists (select 1 from user_assignments a where a.group_id = g.group_id)
+       and not exists (
+           select 1
+             from jsonb_array_elements_text(to_jsonb(g.phones)) p(phone)
+            where exists (select 1 from upload_logs u where u.phone = p.phone)
+               or exists (select 1 from blacklist b where b.phone = p.phone)
+       )
+     order by c.pos nulls last, g.group_id
+     limit 1;
+
+    if v_group is null and cardinality(coalesce(p_candidates, '{}')) > 0 then
+        select g.group_id, to_jsonb(g.phones)
+          into v_group, v_phones
+          from phone_groups g
+         where jsonb_array_length(to_jsonb(g.phones)) > 0
+           and not exists (select 1 from user_assignments a where a.group_id = g.group_id)
+           and not exists (
+               select 1
+                 from jsonb_array_elements_text(to_jsonb(g.phones)) p(phone)
+                where exists (select 1 from upload_logs u where u.phone = p.phone)
+                   or exists (select 1 from blacklist b where b.phone = p.phone)
+           )
+         order by g.group_id
+         limit 1;
+    end if;
+
+    if v_group is null then
+        return jsonb_build_object(
+            'status', 'exhausted',
+            'last_group_id', v_last_group,
+            'last_phones', coalesce(v_last_phones, '[]'::jsonb)
+        );
+    end if;
+
+    insert into user_assignments (uid, group_id, assign_time)
+    values (p_uid, v_group, to_json(now()) #>> '{}');
+
+    return jsonb_build_object(
+        'status', 'ok',
+        'group_id', v_group,
+        'phones', v_phones
+    );
+end;
+$$;
+
+-- 领取路径用到的索引
+create index if not exists user_assignments_uid_idx on user_assignments (uid);
+create index if not exists user_assignments_group_id_idx on user_assignments (group_id);
+create index if not exists upload_logs_phone_idx on upload_logs (phone);
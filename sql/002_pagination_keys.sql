@@ -0,0 +1,13 @@
+-- 分页读取（Storage.iter_rows）按唯一键做 keyset 分页：
+--   whitelist.id / user_assignments.id / phone_groups.group_id /
+--   upload_logs.id / mark_status.phone / blacklist.phone
+-- 若 user_assignments / upload_logs 建表时没有自增 id，在此补上（已有行会自动编号）。
+
+alter table user_assignments add column if not exists id bigint generated by default as identity;
+alter table upload_logs add column if not exists id bigint generated by default as identity;
+
+create unique index if not exists user_assignments_id_key on user_assignments (id);
+create unique index if not exists upload_logs_id_key on upload_logs (id);
+create unique index if not exists phone_groups_group_id_key on phone_groups (group_id);
+create unique index if not exists mark_status_phone_key on mark_status (phone);
+create index if not exists upload_logs_upload_time_idx on upload_logs (upload_time);
@@ -0,0 +1,12 @@
+-- 批量上传（Storage.add_upload_logs）使用 upsert on_conflict=phone + ignore-duplicates，
+-- 依赖 upload_logs.phone 唯一。建索引前先清理历史重复，只保留最早的一条。
+
+delete from upload_logs a
+ using upload_logs b
+ where a.phone = b.phone
+   and a.id > b.id;
+
+create unique index if not exists upload_logs_phone_key on upload_logs (phone);
+
+-- 被唯一索引取代
+drop index if exists upload_logs_phone_idx;
@@ -0,0 +1,57 @@
+-- 标记 / 取消标记：mark_status 与 blacklist 在同一事务内同步更新，一次往返。
+-- p_status 为 null 时逐个切换（已领 <-> 未领），否则统一设为 p_status。
+-- 返回 {phone: 新状态}。所有标记操作串行于同一个 advisory lock，避免并发切换互相覆盖。
+
+-- blacklist.phone 去重并加唯一索引（on conflict 依赖）
+delete from blacklist a
+ using blacklist b
+ where a.phone = b.phone
+   and a.ctid > b.ctid;
+create unique index if not exists blacklist_phone_key on blacklist (phone);
+
+create or replace function set_marks(p_phones text[], p_status text default null)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+begin
+    perform pg_advisory_xact_lock(hashtext('set_marks'));
+
+    with input as (
+        select distinct unnest(p_phones) as p
+    ),
+    next_status as (
+        select i.p,
+               coalesce(
+                   p_status,
+                   case when m.status = '已领' then '未领' else '已领' end
+               ) as s
+          from input i
+          left join mark_status m on m.phone = i.p
+    ),
+    upserted as (
+        insert into mark_status (phone, status)
+        select n.p, n.s from next_status n
+        on conflict (phone) do update set status = excluded.status
+        returning mark_status.phone as p, mark_status.status as s
+    ),
+    added as (
+        insert into blacklist (phone)
+        select u.p from upserted u where u.s = '已领'
+        on conflict do nothing
+        returning 1
+    ),
+    removed as (
+        delete from blacklist b
+         using upserted u
+         where b.phone = u.p and u.s <> '已领'
+        returning 1
+    )
+    select coalesce(jsonb_object_agg(u.p, u.s), '{}'::jsonb)
+      into v_result
+      from upserted u;
+
+    return v_result;
+end;
+$$;
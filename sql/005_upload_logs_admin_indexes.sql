@@ -0,0 +1,8 @@
+-- 管理后台上传记录：按日期范围 / 用户筛选，按 (upload_time, id) 倒序做 keyset 分页
+create index if not exists upload_logs_time_id_idx
+    on upload_logs (upload_time desc, id desc);
+create index if not exists upload_logs_user_time_id_idx
+    on upload_logs (user_id, upload_time desc, id desc);
+
+-- 被 (upload_time, id) 索引取代
+drop index if exists upload_logs_upload_time_idx;
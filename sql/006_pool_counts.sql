@@ -0,0 +1,26 @@
+-- 号码池统计：总号码数 / 已分配号码数 / 黑名单数 / 指定时间段上传数，一次往返在库内聚合。
+-- 供进程内 PoolStats 定期对账，管理后台不再读取全部号码组。
+-- phones 列兼容 text[] 与 jsonb 两种类型。
+
+create or replace function pool_counts(p_day_start text, p_day_end text)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'total_phones',
+        (select coalesce(sum(jsonb_array_length(to_jsonb(g.phones))), 0)
+           from phone_groups g),
+        'assigned_phones',
+        (select coalesce(sum(jsonb_array_length(to_jsonb(g.phones))), 0)
+           from phone_groups g
+          where g.group_id in (select a.group_id from user_assignments a)),
+        'blacklisted',
+        (select count(*) from blacklist),
+        'uploaded_today',
+        (select count(*)
+           from upload_logs u
+          where u.upload_time >= p_day_start
+            and u.upload_time < p_day_end)
+    );
+$$;
@@ -0,0 +1,20 @@
+-- 剩余号码分页：未分配的非空号码组，按 group_id 做 keyset 分页。
+-- 已分配过滤在库内用 NOT EXISTS 反连接完成（走 user_assignments_group_id_idx），
+-- 每页一次往返，不再逐页回查 user_assignments。
+-- phones 列兼容 text[] 与 jsonb 两种类型。
+
+create or replace function unassigned_groups(p_after int, p_limit int)
+returns table (group_id int, phones jsonb)
+language sql
+stable
+as $$
+    select g.group_id, to_jsonb(g.phones)
+      from phone_groups g
+     where (p_after is null or g.group_id > p_after)
+       and jsonb_array_length(to_jsonb(g.phones)) > 0
+       and not exists (
+           select 1 from user_assignments a where a.group_id = g.group_id
+       )
+     order by g.group_id
+     limit p_limit;
+$$;
@@ -0,0 +1,47 @@
+-- 按号码查所在的号码组 pooled_phones(号码数组) → (phone, group_id)：
+-- 追加导入时只核对本批新号码是否已在号码库中，导出时查号码所在的组，不读取整张 phone_groups。
+-- phones 列兼容 text[] 与 jsonb 两种类型：按实际类型建 GIN 索引，
+-- 并选用能走该索引的重叠运算符（text[] 用 &&，jsonb 用 ?|）。
+
+do $$
+declare
+    v_type text;
+begin
+    select c.data_type into v_type
+      from information_schema.columns c
+     where c.table_schema = 'public'
+       and c.table_name = 'phone_groups'
+       and c.column_name = 'phones';
+
+    execute 'create index if not exists phone_groups_phones_gin on phone_groups using gin (phones)';
+
+    if v_type = 'jsonb' then
+        execute $f$
+            create or replace function pooled_phones(p_phones text[])
+            returns table (phone text, group_id int)
+            language sql
+            stable
+            as $body$
+                select p.phone, g.group_id
+                  from phone_groups g
+                 cross join lateral jsonb_array_elements_text(g.phones) p(phone)
+                 where g.phones ?| p_phones
+                   and p.phone = any(p_phones);
+            $body$
+        $f$;
+    else
+        execute $f$
+            create or replace function pooled_phones(p_phones text[])
+            returns table (phone text, group_id int)
+            language sql
+            stable
+            as $body$
+                select p.phone, g.group_id
+                  from phone_groups g
+                 cross join lateral unnest(g.phones) p(phone)
+                 where g.phones && p_phones
+                   and p.phone = any(p_phones);
+            $body$
+        $f$;
+    end if;
+end $$;
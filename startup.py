@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时：从开始导入 app 到首个请求完成的各阶段时间点（每个 worker 进程各一份）。
+
+Render 免费实例休眠后冷启动，这段时间就是用户停在 /ping 页面上等待的时间。
+时间点以"开始导入 app"为 0；process_ms 为进程启动到开始导入的时间（解释器启动、
+gunicorn 加载配置等，仅 Linux 可取到）。
+"""
+import os
+import threading
+import time
+
+
+def process_age():
+    """当前进程已运行的秒数；取不到时返回 None"""
+    try:
+        with open("/proc/self/stat") as f:
+            # 第 2 列（进程名）可能含空格，从最后一个 ")" 之后开始数
+            fields = f.read().rpartition(")")[2].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        start_ticks = int(fields[19])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.process_age = process_age()
+        self.lock = threading.Lock()
+        self.marks = {}
+        self.durations = {}
+
+    def mark(self, name):
+        """记录时间点（只记第一次）；首次记录返回 True"""
+        with self.lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = time.perf_counter() - self.started
+            return True
+
+    def record(self, name, seconds):
+        """记录某一步自身的耗时"""
+        with self.lock:
+            self.durations[name] = seconds
+
+    def reset_process(self):
+        """fork 之后：子进程的首个请求 / 存储初始化重新计时，导入阶段沿用 master 的记录"""
+        with self.lock:
+            self.marks = {k: v for k, v in self.marks.items() if k == "imported"}
+            self.durations = {}
+
+    def snapshot(self):
+        with self.lock:
+            marks = dict(self.marks)
+            durations = dict(self.durations)
+        return {
+            "pid": os.getpid(),
+            "process_ms": round(self.process_age * 1000, 1)
+            if self.process_age is not None
+            else None,
+            "marks_ms": {k: round(v * 1000, 1) for k, v in marks.items()},
+            "durations_ms": {k: round(v * 1000, 1) for k, v in durations.items()},
+            "uptime_s": round(time.perf_counter() - self.started, 1),
+        }
+
+    def summary(self):
+        snap = self.snapshot()
+        parts = [f"{k} {v:.0f}ms" for k, v in snap["marks_ms"].items()]
+        parts += [f"{k} 耗时 {v:.0f}ms" for k, v in snap["durations_ms"].items()]
+        if snap["process_ms"] is not None:
+            parts.insert(0, f"进程启动到导入 {snap['process_ms']:.0f}ms")
+        return f"⏱ 启动耗时 (pid {snap['pid']}): " + ", ".join(parts)
@@ -0,0 +1,115 @@
+function copyWangwang() {
+  const text = "497332360";
+
+  // 优先使用 clipboard API（现代浏览器）
+  if (navigator.clipboard && window.isSecureContext) {
+    navigator.clipboard.writeText(text).then(() => {
+      alert("✅ 已复制旺旺号：" + text);
+    }).catch(() => {
+      fallbackCopy(text);
+    });
+  } else {
+    fallbackCopy(text);
+  }
+}
+
+  // 新增自动弹窗控制逻辑
+const RULES_VERSION = "2024-08-12";    // 日期标记
+
+document.addEventListener('DOMContentLoaded', function() {
+  const lastSeenVersion = localStorage.getItem('rulesVersion');
+  if(lastSeenVersion !== RULES_VERSION) {
+    document.getElementById("auto-rules-popup").style.display = "flex";
+  }
+});
+
+function closeAutoPopup() {
+  if(document.getElementById('dontShowAgain').checked) {
+    localStorage.setItem('rulesVersion', RULES_VERSION); // 存储当前版本
+  }
+  document.getElementById("auto-rules-popup").style.display = "none";
+}
+
+  function showPopup() {
+    document.getElementById("popup").style.display = "block";
+  }
+
+  function closePopup() {
+    document.getElementById("popup").style.display = "none";
+  }
+
+  function showRules() {
+    document.getElementById("popup-rules").style.display = "flex";
+  }
+
+  function closeRulesPopup() {
+    document.getElementById("popup-rules").style.display = "none";
+  }
+
+  function copyPopupText() {
+    const content = document.getElementById("popup-content").innerText;
+
+    if (navigator.clipboard && window.isSecureContext) {
+      navigator.clipboard.writeText(content).then(() => {
+        alert("✅ 已复制");
+      }).catch(() => {
+        fallbackCopy(content);
+      });
+    } else {
+      fallbackCopy(content);
+    }
+  }
+
+  function fallbackCopy(text) {
+    const textarea = document.createElement("textarea");
+    textarea.value = text;
+    textarea.style.position = "fixed";
+    textarea.style.opacity = 0;
+    document.body.appendChild(textarea);
+    textarea.focus();
+    textarea.select();
+
+    try {
+      const success = document.execCommand("copy");
+      alert(success ? "✅ 已复制" : "❌ 复制失败，请长按手动复制");
+    } catch (err) {
+      alert("❌ 复制失败，请长按手动复制");
+    }
+
+    document.body.removeChild(textarea);
+  }
+
+// 显示弹窗
+function showMaterial() {
+    document.getElementById("materialPopup").style.display = "flex";
+    // 自动显示手机端操作提示
+    if (/Android|iPhone|iPad/i.test(navigator.userAgent)) {
+        document.getElementById("downloadHint").style.display = "block";
+    }
+}
+
+// 关闭弹窗
+function closeMaterialPopup() {
+    document.getElementById("materialPopup").style.display = "none";
+}
+
+// 下载/保存图片
+function downloadImage() {
+    const imageUrl = document.getElementById("materialImage").src;
+    const fileName = '云顶加人素材.jpg';
+
+    // 方法1：创建下载链接（桌面浏览器有效）
+    const link = document.createElement('a');
+    link.href = imageUrl;
+    link.download = fileName;
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+
+    // 方法2：提示移动端用户手动保存
+    if (/Android|iPhone|iPad/i.test(navigator.userAgent)) {
+        alert('请长按图片，然后选择"保存到相册"');
+    } else {
+        alert('图片已开始下载，请查看您的下载文件夹');
+    }
+}
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""存储后端：路由只依赖 Storage 接口，具体实现按环境变量选择。
+
+STORAGE_BACKEND=supabase（默认）使用 Supabase；
+STORAGE_BACKEND=sqlite 使用本地 SQLite，SQLITE_PATH 默认为 :memory:（纯内存），
+SQLITE_LATENCY_MS 可为每次往返加上模拟的网络延迟。
+"""
+import os
+
+from .base import Storage, StorageConfigError
+from .sqlite_backend import SQLiteStorage
+
+
+def check_config(backend=None):
+    """只检查配置、不创建客户端（gunicorn master 启动时用）；返回后端名"""
+    backend = (backend or os.getenv("STORAGE_BACKEND", "supabase")).lower()
+    if backend == "supabase":
+        if not os.getenv("SUPABASE_URL") or not os.getenv("SUPABASE_KEY"):
+            raise StorageConfigError("SUPABASE_URL 或 SUPABASE_KEY 未设置!")
+    elif backend != "sqlite":
+        raise StorageConfigError(f"未知的 STORAGE_BACKEND: {backend}")
+    return backend
+
+
+def create_storage(backend=None):
+    """按配置创建存储后端实例"""
+    backend = check_config(backend)
+    if backend == "sqlite":
+        latency = float(os.getenv("SQLITE_LATENCY_MS", "0")) / 1000
+        return SQLiteStorage(os.getenv("SQLITE_PATH", ":memory:"), latency=latency)
+    from .supabase_backend import SupabaseStorage
+
+    return SupabaseStorage.from_credentials(
+        os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    )
+
+
+__all__ = [
+    "Storage",
+    "StorageConfigError",
+    "SQLiteStorage",
+    "check_config",
+    "create_storage",
+]
@@ -0,0 +1,552 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytz
+
+MARKED = "已领"
+UNMARKED = "未领"
+
+
+def chunked(items, size):
+    """把可迭代对象按 size 切成列表块，惰性产出"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class StorageConfigError(RuntimeError):
+    """存储后端配置缺失或无效"""
+
+
+def utc_now_iso():
+    """assign_time 使用 ISO8601 UTC 字符串，例如 '2025-08-12T15:06:45.123456+00:00'"""
+    return datetime.now(pytz.UTC).isoformat()
+
+
+def china_now_str():
+    """upload_time 使用北京时间 '%Y-%m-%d %H:%M:%S'"""
+    return datetime.now(pytz.timezone("Asia/Shanghai")).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Storage:
+    """
+    存储接口。表结构与 Supabase 保持一致：
+    - whitelist(id)
+    - user_assignments(uid, group_id, assign_time)
+    - phone_groups(group_id, phones)
+    - upload_logs(user_id, phone, upload_time)
+    - mark_status(phone, status)
+    - blacklist(phone)
+
+    批量读取统一走 iter_rows：按键范围分页（keyset），逐页惰性产出，
+    不受 PostgREST max-rows 截断，内存占用与页大小而非表大小相关。
+    """
+
+    # 各表分页使用的唯一键
+    PAGE_KEYS = {
+        "whitelist": "id",
+        "user_assignments": "id",
+        "phone_groups": "group_id",
+        "upload_logs": "id",
+        "mark_status": "phone",
+        "blacklist": "phone",
+    }
+    PAGE_SIZE = 1000
+    # in (...) 查询的每块条数：Supabase 上 in_ 过滤放在 GET 查询串里，过长会超出代理的 URL 限制
+    LOOKUP_CHUNK = 200
+
+    # ----- 写入事件 -----
+    def add_listener(self, listener):
+        """
+        注册写入事件监听 listener(event, phones)，用于维护进程内索引。event 取值：
+        uploaded / blacklisted / unblacklisted / blacklist_reset（phones 为新的完整黑名单）
+        """
+        self.__dict__.setdefault("_listeners", []).append(listener)
+
+    def _notify(self, event, phones):
+        for listener in self.__dict__.get("_listeners", ()):
+            listener(event, phones)
+
+    # ----- 传输层 -----
+    def transport_stats(self):
+        """HTTP 连接池 / 重试统计；本地后端没有 HTTP 传输层，返回 None"""
+        return None
+
+    # ----- 分页读取 -----
+    def iter_rows(self, table, columns, filters=(), page_size=None):
+        """
+        按 PAGE_KEYS[table] 升序分页读取，逐行产出 dict。
+        columns 为列名序列（分页键会自动加入）；
+        filters 为 (op, column, value) 序列，op 取 eq / neq / gt / gte / lt / lte / in_。
+        """
+        raise NotImplementedError
+
+    # ----- 白名单 -----
+    def load_whitelist(self):
+        """返回全部白名单 ID 列表"""
+        return [row["id"] for row in self.iter_rows("whitelist", ["id"])]
+
+    WHITELIST_BATCH = 500
+
+    def save_whitelist(self, ids):
+        """把白名单设为 ids（按差异增删，不再整表重写）"""
+        self.sync_whitelist(ids)
+
+    def sync_whitelist(self, ids):
+        """
+        差异同步白名单：只插入新增的 ID、删除移除的 ID，分批写入。
+        返回 (added, removed)。
+        """
+        wanted = dict.fromkeys(i for i in ids if i)  # 保序去重
+        removed = []
+        for row in self.iter_rows("whitelist", ["id"]):
+            if row["id"] in wanted:
+                del wanted[row["id"]]
+            else:
+                removed.append(row["id"])
+        added = list(wanted)
+        self.remove_from_whitelist(removed)
+        self.add_to_whitelist(added)
+        return added, removed
+
+    def add_to_whitelist(self, ids):
+        """批量加入白名单（已存在的忽略）"""
+        for chunk in chunked(ids, self.WHITELIST_BATCH):
+            self._insert_whitelist(chunk)
+
+    def remove_from_whitelist(self, ids):
+        """批量移出白名单；删除条件是 in (...) 查询串，按 LOOKUP_CHUNK 分块"""
+        for chunk in chunked(ids, self.LOOKUP_CHUNK):
+            self._delete_whitelist(chunk)
+
+    def _insert_whitelist(self, ids):
+        raise NotImplementedError
+
+    def _delete_whitelist(self, ids):
+        raise NotImplementedError
+
+    # ----- 分配记录 -----
+    def get_user_assignments(self, uid):
+        """获取用户所有分配记录：[{group_id, assign_time}]"""
+        raise NotImplementedError
+
+    def get_last_assignment(self, uid):
+        """获取用户最近一次分配记录，没有则返回 None"""
+        raise NotImplementedError
+
+    def get_all_assigned_indices(self):
+        """获取所有已分配的组索引"""
+        return {row["group_id"] for row in self.iter_rows("user_assignments", ["group_id"])}
+
+    def add_user_assignment(self, uid, group_id):
+        """添加新的分配记录"""
+        raise NotImplementedError
+
+    def delete_user_assignments(self, uid):
+        """删除用户的全部分配记录"""
+        raise NotImplementedError
+
+    def claim_next_group(self, uid, max_times, interval_seconds, candidates=()):
+        """
+        原子领取（单次往返）：在一个事务内检查白名单、次数上限、冷却并分配下一个可用组。
+        candidates 为优先尝试的组号，全部不可用时按 group_id 顺序查找。
+        返回 {"status": ...}，status 取值：
+        - ok：group_id / phones 为本次分配的组
+        - not_whitelisted
+        - max_times：已从白名单移除，last_phones 为上一次的号码
+        - cooldown：wait_seconds 为剩余冷却秒数，附带 last_phones
+        - exhausted：没有可用组，附带 last_phones
+        """
+        raise NotImplementedError
+
+    # ----- 手机号组 -----
+    def load_phone_groups(self):
+        """按 group_id 顺序返回所有非空号码组"""
+        return list(self.load_phone_group_map().values())
+
+    def load_phone_group_map(self):
+        """按 group_id 顺序返回 {group_id: phones}，跳过空组"""
+        return {
+            row["group_id"]: row["phones"]
+            for row in self.iter_rows("phone_groups", ["group_id", "phones"])
+            if row.get("phones")
+        }
+
+    def get_phone_groups(self, group_ids):
+        """按组号取指定的号码组：{group_id: phones}，不存在或为空的组不返回"""
+        result = {}
+        for chunk in chunked(sorted(set(group_ids)), self.LOOKUP_CHUNK):
+            result.update(self._get_phone_groups(chunk))
+        return result
+
+    def _get_phone_groups(self, group_ids):
+        raise NotImplementedError
+
+    def iter_unassigned_groups(self, after=None, page_size=None):
+        """
+        按 group_id 顺序惰性产出未分配的非空组 (group_id, phones)。
+        after 为上一页最后的组号；每页一次往返，已分配的组由后端在库内过滤。
+        """
+        page_size = page_size or self.PAGE_SIZE
+        while True:
+            page = self.unassigned_group_page(after, page_size)
+            if not page:
+                return
+            yield from page
+            after = page[-1][0]
+
+    def unassigned_group_page(self, after, limit):
+        """组号大于 after（None 为从头开始）的前 limit 个未分配非空组：[(group_id, phones)]"""
+        raise NotImplementedError
+
+    def assigned_group_ids(self, group_ids):
+        """给定组号中已有分配记录的子集；按块查询，不读全部分配"""
+        assigned = set()
+        for chunk in chunked(sorted(set(group_ids)), self.LOOKUP_CHUNK):
+            assigned.update(
+                row["group_id"]
+                for row in self.iter_rows(
+                    "user_assignments", ["group_id"], [("in_", "group_id", chunk)]
+                )
+            )
+        return assigned
+
+    def find_pooled(self, phones):
+        """已在号码库中的号码及其所在组 {phone: group_id}；按块查询，不读整个号码库"""
+        phones = list(set(phones))
+        pooled = {}
+        for i in range(0, len(phones), self.LOOKUP_CHUNK):
+            pooled.update(self._find_pooled(phones[i : i + self.LOOKUP_CHUNK]))
+        return pooled
+
+    def _find_pooled(self, phones):
+        raise NotImplementedError
+
+    GROUP_BATCH = 500
+
+    def save_phone_groups(self, groups):
+        """
+        清空并按 0.. 重新编号写入号码组。groups 可以是生成器：
+        每 GROUP_BATCH 组写入一次，内存与单次请求大小都与号码库总量无关。
+        返回写入的组数。
+        """
+        self._clear_phone_groups()
+        return len(self._write_phone_groups(groups, 0))
+
+    def append_phone_groups(self, groups):
+        """在现有最大组号之后追加新组，已有组（及其分配记录）不受影响；返回新组号列表"""
+        return self._write_phone_groups(groups, self.max_group_id() + 1)
+
+    def append_phones(self, phones, group_size=10):
+        """
+        追加导入：剔除已在号码库中的号码和上传内的重复号码，其余每 group_size 个一组
+        追加到现有组号之后。phones 可以是生成器：每次取 GROUP_BATCH 组的号码，
+        只查这些号码是否已在号码库中（find_pooled），写入后再处理下一块，
+        前面块写入的号码由之后的查询去重。内存与往返次数只与新号码数量有关。返回新组号列表。
+        """
+        next_id = self.max_group_id() + 1
+        new_ids = []
+        pending = []  # 已确认不在号码库中、还凑不满一组的号码
+        for chunk in chunked(phones, self.GROUP_BATCH * group_size):
+            fresh = [p for p in dict.fromkeys(chunk) if p not in pending]
+            pooled = self.find_pooled(fresh)
+            pending.extend(p for p in fresh if p not in pooled)
+            full = len(pending) - len(pending) % group_size
+            ids = self._write_phone_groups(chunked(pending[:full], group_size), next_id)
+            new_ids.extend(ids)
+            next_id += len(ids)
+            pending = pending[full:]
+        if pending:
+            new_ids.extend(self._write_phone_groups([pending], next_id))
+        return new_ids
+
+    def sync_phone_groups(self, phones, group_size=10):
+        """
+        差异导入：phones 为期望的完整号码库。
+        - 已分配的组，或号码全部仍在新库中的组：保持原样（组号不变）
+        - 其余组删除，其中仍在新库里的号码与新号码一起追加为新组
+        只写变化的部分。返回 (新组号列表, 删除的组号列表)。
+        需要把整个文件的号码放进内存比较，大文件请用 append_phones。
+        """
+        wanted = dict.fromkeys(phones)  # 保序去重
+        stale = []
+        rows = self.iter_rows("phone_groups", ["group_id", "phones"])
+        for page in chunked(rows, self.PAGE_SIZE):
+            changed = {
+                row["group_id"]
+                for row in page
+                if not (row.get("phones") and all(p in wanted for p in row["phones"]))
+            }
+            # 只对有变化的组查分配记录
+            changed -= self.assigned_group_ids(changed)
+            for row in page:
+                if row["group_id"] in changed:
+                    stale.append(row["group_id"])
+                else:
+                    for phone in row.get("phones") or ():
+                        wanted.pop(phone, None)
+        self.delete_phone_groups(stale)
+        return self.append_phone_groups(chunked(wanted, group_size)), stale
+
+    def _write_phone_groups(self, groups, start_id):
+        ids = []
+        batch = []
+        for group in groups:
+            batch.append((start_id + len(ids), group))
+            ids.append(start_id + len(ids))
+            if len(batch) >= self.GROUP_BATCH:
+                self._insert_phone_groups(batch)
+                batch = []
+        if batch:
+            self._insert_phone_groups(batch)
+        return ids
+
+    def max_group_id(self):
+        """当前最大组号，空表返回 -1"""
+        raise NotImplementedError
+
+    def delete_phone_groups(self, group_ids):
+        """按组号批量删除；删除条件是 in (...) 查询串，按 LOOKUP_CHUNK 分块"""
+        for chunk in chunked(group_ids, self.LOOKUP_CHUNK):
+            self._delete_phone_groups(chunk)
+
+    def _delete_phone_groups(self, group_ids):
+        raise NotImplementedError
+
+    def _clear_phone_groups(self):
+        raise NotImplementedError
+
+    def _insert_phone_groups(self, rows):
+        """一次往返写入一批 (group_id, phones)"""
+        raise NotImplementedError
+
+    # ----- 上传记录 -----
+    def load_upload_log_rows(self):
+        """返回全部上传记录行：[{user_id, phone, upload_time}]"""
+        return list(self.iter_rows("upload_logs", ["user_id", "phone", "upload_time"]))
+
+    def page_upload_logs(self, user_id=None, start=None, end=None, before=None, limit=100):
+        """
+        按 upload_time、id 倒序分页查询上传记录，筛选在后端完成：
+        user_id 精确匹配；start <= upload_time < end；
+        before 为上一页最后一行的 (upload_time, id)，作为 keyset 游标。
+        返回 [{id, user_id, phone, upload_time}]。
+        """
+        raise NotImplementedError
+
+    def iter_upload_logs(self, user_id=None, start=None, end=None, page_size=None):
+        """
+        按 page_upload_logs 的倒序逐页惰性产出上传记录，筛选同 page_upload_logs。
+        读到空页才结束：PostgREST 的 max-rows 可能小于 page_size，短页不代表已读完。
+        """
+        page_size = page_size or self.PAGE_SIZE
+        before = None
+        while True:
+            rows = self.page_upload_logs(user_id, start, end, before, page_size)
+            if not rows:
+                return
+            yield from rows
+            before = (rows[-1]["upload_time"], rows[-1]["id"])
+
+    def iter_upload_log_report(self, user_id=None, start=None, end=None, page_size=None):
+        """
+        导出用：上传记录逐行附上标记状态和分配信息（领取该号码所在组的 uid / 组号 / 时间）。
+        每页只查询本页号码的标记、本页号码所在的组（find_pooled）和这些组的分配记录，
+        内存与页大小有关，与导出范围无关。
+        产出 {upload_time, user_id, phone, status, assigned_uid, group_id, assign_time}。
+        """
+        page_size = page_size or self.PAGE_SIZE
+        rows = self.iter_upload_logs(user_id, start, end, page_size)
+        for page in chunked(rows, page_size):
+            phones = [row["phone"] for row in page]
+            marks = self.get_marks(phones)
+            pooled = self.find_pooled(phones)
+            claims = {}  # group_id -> 最早的分配记录
+            for chunk in chunked(sorted(set(pooled.values())), self.LOOKUP_CHUNK):
+                for a in self.iter_rows(
+                    "user_assignments",
+                    ["uid", "group_id", "assign_time"],
+                    [("in_", "group_id", chunk)],
+                ):
+                    claims.setdefault(a["group_id"], a)
+            for row in page:
+                claim = claims.get(pooled.get(row["phone"]), {})
+                yield {
+                    "upload_time": row["upload_time"],
+                    "user_id": row["user_id"],
+                    "phone": row["phone"],
+                    "status": marks.get(row["phone"], UNMARKED),
+                    "assigned_uid": claim.get("uid"),
+                    "group_id": claim.get("group_id"),
+                    "assign_time": claim.get("assign_time"),
+                }
+
+    UPLOAD_BATCH = 500
+
+    def add_upload_log(self, uid, phone):
+        """写入上传记录；该号码已被任何用户上传过则返回 False"""
+        inserted, _ = self.add_upload_logs(uid, [phone])
+        return bool(inserted)
+
+    def add_upload_logs(self, uid, phones):
+        """
+        批量写入上传记录，依赖 upload_logs.phone 唯一约束 on conflict do nothing 全局去重。
+        返回 (inserted, duplicates)：按输入顺序分别列出写入成功和重复跳过的号码
+        （同一批内重复出现的号码只写入第一次）。
+        """
+        phones = list(phones)
+        unique = list(dict.fromkeys(phones))
+
+        upload_time = china_now_str()
+        written = set()
+        for i in range(0, len(unique), self.UPLOAD_BATCH):
+            written |= self._insert_upload_logs(
+                uid, unique[i : i + self.UPLOAD_BATCH], upload_time
+            )
+
+        inserted, duplicates = [], []
+        for phone in phones:
+            if phone in written:
+                inserted.append(phone)
+                written.discard(phone)
+            else:
+                duplicates.append(phone)
+        if duplicates:
+            print(f"已存在记录(全局): {', '.join(duplicates)}，跳过上传")
+        if inserted:
+            self._notify("uploaded", inserted)
+        return inserted, duplicates
+
+    def _insert_upload_logs(self, uid, phones, upload_time):
+        """一次往返插入一批（on conflict do nothing），返回实际写入的号码集合"""
+        raise NotImplementedError
+
+    def upload_phones_since(self, watermark):
+        """返回 upload_time >= watermark 的上传记录：[{phone, upload_time}]（分页读取）"""
+        return list(
+            self.iter_rows(
+                "upload_logs",
+                ["phone", "upload_time"],
+                [("gte", "upload_time", watermark)],
+            )
+        )
+
+    def upload_log_phones(self):
+        """返回 upload_logs 中出现过的全部号码集合"""
+        return {
+            row["phone"]
+            for row in self.iter_rows("upload_logs", ["phone"])
+            if row.get("phone")
+        }
+
+    # ----- 标记 / 黑名单 -----
+    def load_marks(self):
+        """返回 {phone: status}"""
+        return {
+            row["phone"]: row["status"]
+            for row in self.iter_rows("mark_status", ["phone", "status"])
+        }
+
+    def get_marks(self, phones):
+        """只取给定号码的标记状态：{phone: status}"""
+        result = {}
+        for chunk in chunked(list(dict.fromkeys(phones)), self.LOOKUP_CHUNK):
+            result.update(self._get_marks(chunk))
+        return result
+
+    def _get_marks(self, phones):
+        raise NotImplementedError
+
+    MARK_BATCH = 1000
+
+    def toggle_mark(self, phone):
+        """切换标记状态并同步黑名单，返回新状态"""
+        return self.set_marks([phone])[phone]
+
+    def set_marks(self, phones, status=None):
+        """
+        批量标记：mark_status 与 blacklist 在一次原子调用内同步更新。
+        status 为 None 时逐个切换（已领 <-> 未领），否则统一设为 status。
+        返回 {phone: 新状态}。
+        """
+        phones = list(dict.fromkeys(p for p in phones if p))
+        result = {}
+        for i in range(0, len(phones), self.MARK_BATCH):
+            result.update(self._set_marks(phones[i : i + self.MARK_BATCH], status))
+        marked = [p for p, s in result.items() if s == MARKED]
+        unmarked = [p for p, s in result.items() if s != MARKED]
+        if marked:
+            self._notify("blacklisted", marked)
+        if unmarked:
+            self._notify("unblacklisted", unmarked)
+        return result
+
+    def _set_marks(self, phones, status):
+        """一次往返处理一批标记，返回 {phone: 新状态}"""
+        raise NotImplementedError
+
+    def load_blacklist(self):
+        """返回黑名单号码集合"""
+        return {row["phone"] for row in self.iter_rows("blacklist", ["phone"])}
+
+    def save_blacklist(self, phones):
+        """清空并重写黑名单"""
+        raise NotImplementedError
+
+    def blacklist_count(self):
+        raise NotImplementedError
+
+    # ----- 统计 -----
+    def pool_counts(self, day_start, day_end):
+        """
+        一次聚合查询返回号码池计数：
+        {total_phones, assigned_phones, blacklisted, uploaded_today}，
+        uploaded_today 统计 day_start <= upload_time < day_end。
+        """
+        raise NotImplementedError
+
+    def blacklist_preview(self, n=10):
+        raise NotImplementedError
+
+    def find_uploaded(self, phones):
+        """返回给定号码中已出现在 upload_logs 的部分"""
+        raise NotImplementedError
+
+    def find_blacklisted(self, phones):
+        """返回给定号码中在黑名单内的部分"""
+        raise NotImplementedError
+
+    # ----- 组合查询 -----
+    def get_taken_phones(self):
+        """
+        全局已占用号码集合：
+        - upload_logs 中已上传的所有 phone
+        - blacklist 黑名单
+        """
+        taken = set()
+        try:
+            taken.update(self.upload_log_phones())
+        except Exception as e:
+            print("读取 upload_logs 失败：", e)
+
+        try:
+            taken.update(self.load_blacklist())
+        except Exception as e:
+            print("读取 blacklist 失败：", e)
+
+        return taken
+
+    def find_taken(self, phones):
+        """只查询给定号码的占用情况（upload_logs + blacklist），返回被占用的子集"""
+        phones = list(set(phones))
+        taken = set()
+        # 分批查询，避免 in (...) 过长
+        for i in range(0, len(phones), self.LOOKUP_CHUNK):
+            chunk = phones[i : i + self.LOOKUP_CHUNK]
+            taken |= self.find_uploaded(chunk) | self.find_blacklisted(chunk)
+        return taken
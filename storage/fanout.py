@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+并发读取：同一请求内互不依赖的后端读取放进有界线程池同时发出，再汇合结果，
+路由耗时取决于最慢的一次查询而不是全部相加。
+
+- 每个任务在调用方 contextvars 的副本中运行，后端调用仍记入当前请求的追踪
+- max_workers=0 时退化为顺序执行（压测对比 / 排查问题用）
+- fork 之后线程不会被子进程继承：在子进程里首次提交时重建线程池
+- 不要在任务里再嵌套 gather：线程池有界，嵌套等待可能占满全部线程
+"""
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class FanOut:
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pid = None
+
+    def _executor(self):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.executor = ThreadPoolExecutor(
+                        self.max_workers, thread_name_prefix="fanout"
+                    )
+                    self.pid = os.getpid()
+        return self.executor
+
+    def submit(self, fn, *args, **kwargs):
+        """提交一个读取，返回 Future；顺序模式下立即执行"""
+        if self.max_workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        ctx = contextvars.copy_context()
+        return self._executor().submit(ctx.run, fn, *args, **kwargs)
+
+    def gather(self, *calls):
+        """
+        calls 为无参可调用对象（通常是 lambda / functools.partial），并发执行并按顺序返回结果；
+        最后一个在当前线程执行，少一次线程切换。任一失败时抛出其异常。
+        """
+        if not calls:
+            return []
+        futures = [self.submit(call) for call in calls[:-1]]
+        last = calls[-1]()
+        return [f.result() for f in futures] + [last]
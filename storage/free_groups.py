@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+空闲号码组索引：进程内维护"未分配且干净"的组号最小堆，
+领取时取出堆顶若干组号作为 claim_next_group 的候选，
+数据库只需校验这几个组，不必每次从头扫描 phone_groups。
+
+维护方式：
+- 领取：被领取的组和校验不通过的候选移出索引，其余候选放回
+- 上传 / 拉黑：组内号码被占用后，原子领取的校验会判定其不可用，随后剔除
+- 重置领取记录：对应组号放回堆中
+- 导入新号码库：整体失效，下次领取时重建
+候选只是加速提示；索引过期时 claim_next_group 会回退到按顺序查找，
+其他 worker 的写入再通过定期重建同步。
+
+重建在锁外读库，建好后在锁内整体替换：首次构建时领取请求等待（只有一个线程在建），
+之后的定期重建放到后台线程，期间领取继续使用旧堆。
+"""
+import heapq
+import threading
+import time
+
+CANDIDATES = 4
+
+
+class FreeGroupIndex:
+    def __init__(self, storage, taken_phones=None, reseed_seconds=600):
+        self.storage = storage
+        self.taken_phones = taken_phones
+        self.reseed_seconds = reseed_seconds
+        self.lock = threading.Lock()
+        self.seed_lock = threading.Lock()
+        self.heap = None
+        self.members = set()
+        self.seeded_at = 0.0
+        # 号码库失效次数：构建期间发生失效，建好的结果作废
+        self.generation = 0
+        self.reseeding = False
+        # 构建期间释放的组号（构建读库时可能还是已分配），替换时补回
+        self.released_during_seed = None
+
+    def _build(self):
+        """读库构建空闲组堆：O(总号码数)，不持有 self.lock"""
+        groups = self.storage.load_phone_group_map()
+        assigned = self.storage.get_all_assigned_indices()
+        unassigned = {gid: phones for gid, phones in groups.items() if gid not in assigned}
+        if self.taken_phones is not None:
+            taken = self.taken_phones.find_taken(
+                [p for phones in unassigned.values() for p in phones]
+            )
+        else:
+            taken = self.storage.get_taken_phones()
+        heap = [
+            gid
+            for gid, phones in unassigned.items()
+            if all(p not in taken for p in phones)
+        ]
+        heapq.heapify(heap)
+        return heap
+
+    def _expired(self):
+        return time.monotonic() - self.seeded_at > self.reseed_seconds
+
+    def seed(self, only_if_needed=False):
+        """全量重建后整体替换；同一时间只有一个线程在建"""
+        with self.seed_lock:
+            if only_if_needed and self.heap is not None and not self._expired():
+                return
+            with self.lock:
+                generation = self.generation
+                self.released_during_seed = []
+            try:
+                heap = self._build()
+            except Exception:
+                with self.lock:
+                    self.released_during_seed = None
+                raise
+            with self.lock:
+                released, self.released_during_seed = self.released_during_seed, None
+                if generation != self.generation:
+                    return
+                members = set(heap)
+                for gid in released:
+                    if gid not in members:
+                        heapq.heappush(heap, gid)
+                        members.add(gid)
+                self.heap = heap
+                self.members = members
+                self.seeded_at = time.monotonic()
+
+    def _background_reseed(self):
+        try:
+            self.seed(only_if_needed=True)
+        except Exception as e:
+            print(f"⚠️ 空闲组索引重建失败，继续使用旧索引: {e}")
+        finally:
+            with self.lock:
+                self.reseeding = False
+
+    def _ensure_seeded(self):
+        if self.heap is None:
+            # 冷索引没有可用的候选：等首次构建完成（并发请求只建一次）
+            self.seed(only_if_needed=True)
+        elif self._expired():
+            with self.lock:
+                if self.reseeding:
+                    return
+                self.reseeding = True
+            threading.Thread(
+                target=self._background_reseed, name="free-groups-reseed", daemon=True
+            ).start()
+
+    def take_candidates(self, n=CANDIDATES):
+        """取出组号最小的 n 个候选（取出期间其他线程不会拿到同样的组）"""
+        self._ensure_seeded()
+        with self.lock:
+            taken = []
+            while self.heap and len(taken) < n:
+                gid = heapq.heappop(self.heap)
+                self.members.discard(gid)
+                taken.append(gid)
+            return taken
+
+    def settle(self, candidates, result):
+        """根据 claim_next_group 的结果处理取出的候选"""
+        status = result.get("status")
+        if status == "ok":
+            chosen = result.get("group_id")
+            # 候选按顺序校验：排在被选中组之前的都不可用
+            keep = candidates[candidates.index(chosen) + 1 :] if chosen in candidates else []
+        elif status == "exhausted":
+            keep = []
+        else:
+            # 未进入选组阶段（不在白名单 / 上限 / 冷却），候选原样放回
+            keep = candidates
+        self.release(keep)
+
+    def release(self, group_ids):
+        """组号重新变为可用（例如重置领取记录后）"""
+        group_ids = list(group_ids)
+        with self.lock:
+            if self.released_during_seed is not None:
+                self.released_during_seed.extend(
+                    gid for gid in group_ids if isinstance(gid, int)
+                )
+            if self.heap is None:
+                return
+            for gid in group_ids:
+                if isinstance(gid, int) and gid not in self.members:
+                    heapq.heappush(self.heap, gid)
+                    self.members.add(gid)
+
+    def invalidate(self):
+        """号码库整体变化，下次领取时重建"""
+        with self.lock:
+            self.heap = None
+            self.members = set()
+            self.generation += 1
+
+    def __len__(self):
+        return len(self.heap or ())
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Supabase 客户端底下的 HTTP 传输层（httpx）：
+
+- 有界连接池 + keep-alive，装了 h2 时启用 HTTP/2（同一连接多路复用）
+- 分阶段超时（连接 / 读 / 写 / 等连接池），单次调用不会无限挂住 worker
+- 重试带抖动退避：请求未发出（连接失败、等池超时）时任何方法都可重试；
+  读超时、连接被断开、502/503/504 只对幂等读（GET / HEAD）重试
+- retry_budget：重试只在剩余预算内进行，每次重试的各阶段超时压到剩余预算以内；
+  首次尝试使用完整超时，因此单次调用最长约 max(首次尝试耗时, retry_budget)
+- 统计：请求 / 重试 / 失败次数、新建连接与复用、并发中的请求数与连接池占用
+
+配置见 TransportConfig.from_env()；进程内每个 SupabaseStorage 一个客户端，fork 后不共享。
+"""
+import os
+import random
+import threading
+import time
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # 可选依赖
+    HTTP2_AVAILABLE = False
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+RETRY_STATUS = (502, 503, 504)
+# 剩余预算不足这么多秒时不再重试（这点时间基本不够完成一次请求）
+MIN_RETRY_SECONDS = 0.25
+# 请求一定没有发到服务端，重试不会造成重复写入
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# 请求可能已被处理，只有幂等读可以重试
+READ_RETRY_ERRORS = (httpx.ReadTimeout, httpx.ReadError, httpx.RemoteProtocolError)
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+class TransportConfig:
+    def __init__(
+        self,
+        http2=HTTP2_AVAILABLE,
+        max_connections=20,
+        max_keepalive=10,
+        keepalive_expiry=30.0,
+        connect_timeout=3.0,
+        read_timeout=10.0,
+        write_timeout=10.0,
+        pool_timeout=3.0,
+        retries=2,
+        backoff=0.1,
+        backoff_max=1.0,
+        retry_budget=15.0,
+    ):
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget
+
+    @classmethod
+    def from_env(cls):
+        """
+        SUPABASE_HTTP2、SUPABASE_POOL_MAX / _KEEPALIVE、SUPABASE_KEEPALIVE_EXPIRY、
+        SUPABASE_{CONNECT,READ,WRITE,POOL}_TIMEOUT、SUPABASE_RETRIES、
+        SUPABASE_RETRY_BACKOFF / _BACKOFF_MAX / _BUDGET（时间单位为秒）
+        """
+        d = cls()
+        env = _env_float
+        return cls(
+            http2=os.getenv("SUPABASE_HTTP2", "1").lower() in ("1", "true", "yes"),
+            max_connections=int(env("SUPABASE_POOL_MAX", d.max_connections)),
+            max_keepalive=int(env("SUPABASE_POOL_KEEPALIVE", d.max_keepalive)),
+            keepalive_expiry=env("SUPABASE_KEEPALIVE_EXPIRY", d.keepalive_expiry),
+            connect_timeout=env("SUPABASE_CONNECT_TIMEOUT", d.connect_timeout),
+            read_timeout=env("SUPABASE_READ_TIMEOUT", d.read_timeout),
+            write_timeout=env("SUPABASE_WRITE_TIMEOUT", d.write_timeout),
+            pool_timeout=env("SUPABASE_POOL_TIMEOUT", d.pool_timeout),
+            retries=int(env("SUPABASE_RETRIES", d.retries)),
+            backoff=env("SUPABASE_RETRY_BACKOFF", d.backoff),
+            backoff_max=env("SUPABASE_RETRY_BACKOFF_MAX", d.backoff_max),
+            retry_budget=env("SUPABASE_RETRY_BUDGET", d.retry_budget),
+        )
+
+    def timeout(self):
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+    def limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class TransportStats:
+    """传输层计数（线程安全）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.attempts = 0
+            self.retries = 0
+            self.failures = 0
+            self.connections_opened = 0
+            self.in_flight = 0
+            self.peak_in_flight = 0
+            self.errors = {}
+
+    def add(self, key, n=1):
+        with self.lock:
+            setattr(self, key, getattr(self, key) + n)
+
+    def error(self, kind):
+        with self.lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def begin(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def end(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "failures": self.failures,
+                "connections_opened": self.connections_opened,
+                # 复用率：不需要新建连接的尝试占比
+                "reuse_ratio": round(1 - self.connections_opened / self.attempts, 3)
+                if self.attempts
+                else None,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "errors": dict(self.errors),
+            }
+
+
+class RetryTransport(httpx.BaseTransport):
+    """包在 httpx.HTTPTransport 外面：重试、计数，并通过 httpcore trace 统计新建连接"""
+
+    def __init__(self, config, stats=None, sleep=time.sleep):
+        self.config = config
+        self.stats = stats or TransportStats()
+        self.sleep = sleep
+        self.inner = httpx.HTTPTransport(
+            http2=config.http2, limits=config.limits(), retries=0
+        )
+
+    def _trace(self, event, info):
+        if event == "connection.connect_tcp.complete":
+            self.stats.add("connections_opened")
+
+    def _backoff(self, attempt):
+        # full jitter：[0, min(上限, base × 2^attempt)) 之间均匀取值，避免多个 worker 同步重试
+        cap = min(self.config.backoff_max, self.config.backoff * 2**attempt)
+        return random.uniform(0, cap)
+
+    def handle_request(self, request):
+        idempotent = request.method in IDEMPOTENT_METHODS
+        request.extensions = dict(request.extensions, trace=self._trace)
+        started = time.monotonic()
+        self.stats.begin()
+        try:
+            attempt = 0
+            while True:
+                self.stats.add("attempts")
+                retry_reason = None
+                try:
+                    response = self.inner.handle_request(request)
+                except NOT_SENT_ERRORS as e:
+                    retry_reason, error = type(e).__name__, e
+                except READ_RETRY_ERRORS as e:
+                    if not idempotent:
+                        self.stats.error(type(e).__name__)
+                        self.stats.add("failures")
+                        raise
+                    retry_reason, error = type(e).__name__, e
+                else:
+                    if not (idempotent and response.status_code in RETRY_STATUS):
+                        return response
+                    retry_reason, error = f"http_{response.status_code}", None
+
+                self.stats.error(retry_reason)
+                delay = self._backoff(attempt)
+                # 下一次尝试可用的时间：扣掉已用时间和退避等待
+                remaining = (
+                    self.config.retry_budget - (time.monotonic() - started) - delay
+                )
+                if attempt >= self.config.retries or remaining < MIN_RETRY_SECONDS:
+                    self.stats.add("failures")
+                    if error is not None:
+                        raise error
+                    return response
+                if error is None:
+                    # 读完响应体再关闭，连接可以放回池里复用
+                    response.read()
+                    response.close()
+                attempt += 1
+                self.stats.add("retries")
+                self.sleep(delay)
+                request.extensions["timeout"] = self._retry_timeout(request, remaining)
+        finally:
+            self.stats.end()
+
+    @staticmethod
+    def _retry_timeout(request, remaining):
+        """重试用的超时：各阶段都不超过剩余预算"""
+        timeout = request.extensions.get("timeout") or {}
+        return {
+            phase: remaining if value is None else min(value, remaining)
+            for phase, value in (
+                (p, timeout.get(p)) for p in ("connect", "read", "write", "pool")
+            )
+        }
+
+    def pool_snapshot(self):
+        """连接池占用：已打开 / 空闲连接数与上限"""
+        connections = list(getattr(self.inner._pool, "connections", ()))
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            "http2": self.config.http2,
+            "max_connections": self.config.max_connections,
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "utilization": round(
+                (len(connections) - idle) / self.config.max_connections, 3
+            )
+            if self.config.max_connections
+            else None,
+        }
+
+    def close(self):
+        self.inner.close()
+
+
+def create_http_client(config=None, stats=None):
+    """给 Supabase 客户端用的 httpx.Client（超时、连接池、重试都在这里配置）"""
+    config = config or TransportConfig.from_env()
+    transport = RetryTransport(config, stats)
+    client = httpx.Client(
+        transport=transport,
+        timeout=config.timeout(),
+        follow_redirects=True,
+    )
+    return client, transport
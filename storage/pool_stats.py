@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+号码池统计计数器：总号码数 / 已分配 / 剩余 / 已拉黑 / 今日上传。
+
+- 首次读取时用一次聚合查询（pool_counts）对账，不再把全部号码组读进进程
+- 本进程的写入就地增减：上传 / 拉黑事件来自存储层写入事件，领取由调用方通知
+- 重置领取记录、导入号码库等批量变化直接标记失效，下次读取时重新对账
+- 其他 worker 的写入以及重复标记造成的偏差，靠定期对账（reconcile_seconds）修正
+- 跨过北京时间零点时"今日上传"随对账归零
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from .base import china_now_str
+
+
+class PoolStats:
+    def __init__(self, storage, reconcile_seconds=60):
+        self.storage = storage
+        self.reconcile_seconds = reconcile_seconds
+        self.lock = threading.Lock()
+        self.counts = None
+        self.day = None
+        self.reconciled_at = 0.0
+        storage.add_listener(self.on_write)
+
+    def reconcile(self):
+        """聚合查询重新计数：一次往返，计算在数据库内完成"""
+        day = china_now_str()[:10]
+        start = f"{day} 00:00:00"
+        end = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime(
+            "%Y-%m-%d 00:00:00"
+        )
+        counts = self.storage.pool_counts(start, end)
+        with self.lock:
+            self.counts = {
+                "total_phones": counts.get("total_phones") or 0,
+                "assigned_phones": counts.get("assigned_phones") or 0,
+                "blacklisted": counts.get("blacklisted") or 0,
+                "uploaded_today": counts.get("uploaded_today") or 0,
+            }
+            self.day = day
+            self.reconciled_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        expired = time.monotonic() - self.reconciled_at > self.reconcile_seconds
+        if self.counts is None or expired or china_now_str()[:10] != self.day:
+            self.reconcile()
+
+    def snapshot(self):
+        """返回当前计数（必要时先对账）"""
+        self._ensure_fresh()
+        with self.lock:
+            counts = dict(self.counts)
+            age = time.monotonic() - self.reconciled_at
+        counts["remaining_phones"] = max(
+            counts["total_phones"] - counts["assigned_phones"], 0
+        )
+        counts["day"] = self.day
+        counts["reconciled_seconds_ago"] = round(age, 1)
+        return counts
+
+    def _add(self, key, n):
+        with self.lock:
+            if self.counts is not None:
+                self.counts[key] = max(self.counts[key] + n, 0)
+
+    # ----- 写入路径 -----
+    def on_write(self, event, phones):
+        if event == "uploaded":
+            self._add("uploaded_today", len(phones))
+        elif event == "blacklisted":
+            self._add("blacklisted", len(phones))
+        elif event == "unblacklisted":
+            self._add("blacklisted", -len(phones))
+        elif event == "blacklist_reset":
+            with self.lock:
+                if self.counts is not None:
+                    self.counts["blacklisted"] = len(set(phones))
+
+    def on_claim(self, result):
+        """claim_next_group 成功分配后调用"""
+        if result.get("status") == "ok":
+            self._add("assigned_phones", len(result.get("phones") or ()))
+
+    def invalidate(self):
+        """号码库或分配记录批量变化，下次读取时重新对账"""
+        with self.lock:
+            self.counts = None
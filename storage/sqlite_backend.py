@@ -0,0 +1,510 @@
+# -*- coding: utf-8 -*-
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytz
+
+from .base import MARKED, UNMARKED, Storage, utc_now_iso
+from .tracing import payload_size, record_call, tracing_active
+
+# 可领取的组：非空、未分配、组内号码未出现在 upload_logs / blacklist
+_FREE_GROUP_SQL = """
+SELECT g.group_id, g.phones FROM phone_groups g
+WHERE json_array_length(g.phones) > 0
+  AND NOT EXISTS (SELECT 1 FROM user_assignments a WHERE a.group_id = g.group_id)
+  AND NOT EXISTS (
+      SELECT 1 FROM json_each(g.phones) p
+      WHERE EXISTS (SELECT 1 FROM upload_logs u WHERE u.phone = p.value)
+         OR EXISTS (SELECT 1 FROM blacklist b WHERE b.phone = p.value)
+  )
+"""
+
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS whitelist (
+    id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS user_assignments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT NOT NULL,
+    group_id INTEGER NOT NULL,
+    assign_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_user_assignments_uid
+    ON user_assignments (uid, assign_time);
+CREATE INDEX IF NOT EXISTS idx_user_assignments_group
+    ON user_assignments (group_id);
+CREATE TABLE IF NOT EXISTS phone_groups (
+    group_id INTEGER PRIMARY KEY,
+    phones TEXT NOT NULL
+);
+-- 号码 → 组 的索引，由触发器随 phone_groups 维护（对应 Supabase 上 phones 列的 GIN 索引）
+CREATE TABLE IF NOT EXISTS pool_phones (
+    phone TEXT NOT NULL,
+    group_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pool_phones_phone ON pool_phones (phone);
+CREATE INDEX IF NOT EXISTS idx_pool_phones_group ON pool_phones (group_id);
+CREATE TRIGGER IF NOT EXISTS trg_phone_groups_insert AFTER INSERT ON phone_groups
+BEGIN
+    INSERT INTO pool_phones (phone, group_id)
+    SELECT value, NEW.group_id FROM json_each(NEW.phones);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_phone_groups_update AFTER UPDATE OF phones ON phone_groups
+BEGIN
+    DELETE FROM pool_phones WHERE group_id = OLD.group_id;
+    INSERT INTO pool_phones (phone, group_id)
+    SELECT value, NEW.group_id FROM json_each(NEW.phones);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_phone_groups_delete AFTER DELETE ON phone_groups
+BEGIN
+    DELETE FROM pool_phones WHERE group_id = OLD.group_id;
+END;
+CREATE TABLE IF NOT EXISTS upload_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT,
+    phone TEXT,
+    upload_time TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_upload_logs_phone ON upload_logs (phone);
+CREATE INDEX IF NOT EXISTS idx_upload_logs_time ON upload_logs (upload_time, id);
+CREATE INDEX IF NOT EXISTS idx_upload_logs_user_time
+    ON upload_logs (user_id, upload_time, id);
+CREATE TABLE IF NOT EXISTS mark_status (
+    phone TEXT PRIMARY KEY,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blacklist (
+    phone TEXT PRIMARY KEY
+);
+"""
+
+
+class SQLiteStorage(Storage):
+    """
+    本地 SQLite 实现，语义与 SupabaseStorage 一致，用于离线压测 / 性能分析。
+    path 为 ":memory:" 时数据只存在于当前进程内存中。
+    latency 为模拟的每次往返网络延迟（秒），在持锁之外等待，
+    用来在本地复现远程数据库下并发读取的收益。
+    """
+
+    def __init__(self, path=":memory:", latency=0.0):
+        self.path = path
+        self.latency = latency
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # 同一连接在多线程间共享，所有访问串行化
+        self.lock = threading.RLock()
+        self._local = threading.local()
+        with self.lock:
+            self.conn.executescript(SCHEMA)
+            # 建索引表之前创建的数据库文件：补齐号码 → 组索引
+            if not self.conn.execute("SELECT 1 FROM pool_phones LIMIT 1").fetchone():
+                self.conn.execute(
+                    "INSERT INTO pool_phones (phone, group_id)"
+                    " SELECT p.value, g.group_id FROM phone_groups g, json_each(g.phones) p"
+                )
+            self.conn.commit()
+
+    def _execute(self, sql, params=(), many=False):
+        """
+        执行一条语句并记入当前请求的追踪（一条语句视为一次后端往返）。
+        SELECT 与带 RETURNING 的语句返回行列表，其余返回影响行数。调用方负责事务边界。
+        """
+        op = sql.lstrip().split(None, 1)[0].lower()
+        match = _TABLE_RE.search(sql)
+        table = match.group(1) if match else "?"
+        if many:
+            params = list(params)
+        t0 = time.perf_counter()
+        if self.latency and not getattr(self._local, "in_rpc", False):
+            time.sleep(self.latency)
+        with self.lock:
+            if many:
+                cur = self.conn.executemany(sql, params)
+            else:
+                cur = self.conn.execute(sql, params)
+            if op == "select" or " RETURNING " in sql.upper():
+                result = [dict(row) for row in cur.fetchall()]
+                rows = len(result)
+            else:
+                result = rows = cur.rowcount
+        if tracing_active() and not getattr(self._local, "in_rpc", False):
+            record_call(
+                table,
+                op,
+                rows,
+                payload_size(result if op == "select" else params),
+                time.perf_counter() - t0,
+            )
+        return result
+
+    def _query(self, sql, params=()):
+        return self._execute(sql, params)
+
+    def _write(self, sql, params=()):
+        with self.lock, self.conn:
+            return self._execute(sql, params)
+
+    @contextmanager
+    def _rpc(self, name):
+        """
+        对应 Supabase 上的 Postgres 函数：整体在一个 IMMEDIATE 事务中执行，
+        内部语句不单独计数，追踪中记为一次 rpc 往返。
+        """
+        call = {"result": None}
+        t0 = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self._local.in_rpc = True
+            try:
+                with self.conn:
+                    self.conn.execute("BEGIN IMMEDIATE")
+                    yield call
+            finally:
+                self._local.in_rpc = False
+        if tracing_active():
+            result = call["result"]
+            record_call(name, "rpc", 1, payload_size(result), time.perf_counter() - t0)
+
+    # ----- 分页读取 -----
+    _FILTER_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+    def _where(self, filters):
+        clauses, params = [], []
+        for op, column, value in filters:
+            if op == "in_":
+                value = list(value)
+                clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{column} {self._FILTER_OPS[op]} ?")
+                params.append(value)
+        return clauses, params
+
+    def iter_rows(self, table, columns, filters=(), page_size=None):
+        key = self.PAGE_KEYS[table]
+        page_size = page_size or self.PAGE_SIZE
+        cols = list(columns) + ([key] if key not in columns else [])
+        clauses, params = self._where(filters)
+        last = None
+        while True:
+            where = clauses + ([f"{key} > ?"] if last is not None else [])
+            sql = f"SELECT {', '.join(cols)} FROM {table}"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += f" ORDER BY {key} LIMIT ?"
+            page_params = params + ([last] if last is not None else []) + [page_size]
+            rows = self._query(sql, page_params)
+            if table == "phone_groups" and "phones" in cols:
+                for row in rows:
+                    row["phones"] = json.loads(row["phones"])
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last = rows[-1][key]
+
+    # ----- 白名单 -----
+    def _insert_whitelist(self, ids):
+        with self.lock, self.conn:
+            self._execute(
+                "INSERT OR IGNORE INTO whitelist (id) VALUES (?)",
+                [(id_val,) for id_val in ids],
+                many=True,
+            )
+
+    def _delete_whitelist(self, ids):
+        ids = list(ids)
+        placeholders = ", ".join("?" * len(ids))
+        self._write(f"DELETE FROM whitelist WHERE id IN ({placeholders})", ids)
+
+    # ----- 分配记录 -----
+    def get_user_assignments(self, uid):
+        return self._query(
+            "SELECT group_id, assign_time FROM user_assignments WHERE uid = ?",
+            (uid,),
+        )
+
+    def get_last_assignment(self, uid):
+        rows = self._query(
+            "SELECT uid, group_id, assign_time FROM user_assignments"
+            " WHERE uid = ? ORDER BY assign_time DESC LIMIT 1",
+            (uid,),
+        )
+        return rows[0] if rows else None
+
+    def add_user_assignment(self, uid, group_id):
+        self._write(
+            "INSERT INTO user_assignments (uid, group_id, assign_time) VALUES (?, ?, ?)",
+            (uid, group_id, utc_now_iso()),
+        )
+
+    def delete_user_assignments(self, uid):
+        self._write("DELETE FROM user_assignments WHERE uid = ?", (uid,))
+
+    def claim_next_group(self, uid, max_times, interval_seconds, candidates=()):
+        with self._rpc("claim_next_group") as call:
+            call["result"] = result = self._claim_next_group(
+                uid, max_times, interval_seconds, candidates
+            )
+        return result
+
+    def _claim_next_group(self, uid, max_times, interval_seconds, candidates):
+        if not self._query("SELECT 1 FROM whitelist WHERE id = ?", (uid,)):
+            return {"status": "not_whitelisted"}
+
+        assignments = self._query(
+            "SELECT group_id, assign_time FROM user_assignments WHERE uid = ?", (uid,)
+        )
+        last = None
+        last_time = None
+        for row in assignments:
+            try:
+                t = datetime.fromisoformat(row["assign_time"])
+            except (TypeError, ValueError):
+                continue
+            if last_time is None or t > last_time:
+                last, last_time = row, t
+        last_group = last["group_id"] if last else None
+        last_phones = []
+        if last_group is not None:
+            last_phones = self.get_phone_groups([last_group]).get(last_group, [])
+
+        # 次数上限：从白名单移除
+        if len(assignments) >= max_times:
+            self._execute("DELETE FROM whitelist WHERE id = ?", (uid,))
+            return {
+                "status": "max_times",
+                "last_group_id": last_group,
+                "last_phones": last_phones,
+            }
+
+        # 冷却
+        if last_time is not None:
+            if last_time.tzinfo is None:
+                last_time = last_time.replace(tzinfo=pytz.UTC)
+            elapsed = (datetime.now(pytz.UTC) - last_time).total_seconds()
+            if elapsed < interval_seconds:
+                return {
+                    "status": "cooldown",
+                    "wait_seconds": interval_seconds - elapsed,
+                    "last_group_id": last_group,
+                    "last_phones": last_phones,
+                }
+
+        # 选组：先试候选组，全部不可用再按 group_id 顺序找
+        row = None
+        for gid in candidates:
+            rows = self._query(_FREE_GROUP_SQL + " AND g.group_id = ?", (gid,))
+            if rows:
+                row = rows[0]
+                break
+        if row is None:
+            rows = self._query(_FREE_GROUP_SQL + " ORDER BY g.group_id LIMIT 1")
+            row = rows[0] if rows else None
+        if row is None:
+            return {
+                "status": "exhausted",
+                "last_group_id": last_group,
+                "last_phones": last_phones,
+            }
+
+        self._execute(
+            "INSERT INTO user_assignments (uid, group_id, assign_time) VALUES (?, ?, ?)",
+            (uid, row["group_id"], utc_now_iso()),
+        )
+        return {
+            "status": "ok",
+            "group_id": row["group_id"],
+            "phones": json.loads(row["phones"]),
+        }
+
+    # ----- 手机号组 -----
+    def _get_phone_groups(self, group_ids):
+        placeholders = ", ".join("?" * len(group_ids))
+        rows = self._query(
+            f"SELECT group_id, phones FROM phone_groups WHERE group_id IN ({placeholders})",
+            group_ids,
+        )
+        result = {}
+        for row in rows:
+            phones = json.loads(row["phones"])
+            if phones:
+                result[row["group_id"]] = phones
+        return result
+
+    def unassigned_group_page(self, after, limit):
+        rows = self._query(
+            "SELECT g.group_id, g.phones FROM phone_groups g"
+            " WHERE g.group_id > ? AND json_array_length(g.phones) > 0"
+            " AND NOT EXISTS"
+            " (SELECT 1 FROM user_assignments a WHERE a.group_id = g.group_id)"
+            " ORDER BY g.group_id LIMIT ?",
+            (-1 if after is None else after, limit),
+        )
+        return [(row["group_id"], json.loads(row["phones"])) for row in rows]
+
+    def _find_pooled(self, phones):
+        placeholders = ", ".join("?" * len(phones))
+        rows = self._query(
+            f"SELECT phone, group_id FROM pool_phones WHERE phone IN ({placeholders})",
+            phones,
+        )
+        return {row["phone"]: row["group_id"] for row in rows}
+
+    def _clear_phone_groups(self):
+        self._write("DELETE FROM phone_groups")
+
+    def max_group_id(self):
+        rows = self._query("SELECT MAX(group_id) AS max_id FROM phone_groups")
+        max_id = rows[0]["max_id"]
+        return -1 if max_id is None else max_id
+
+    def _delete_phone_groups(self, group_ids):
+        group_ids = list(group_ids)
+        placeholders = ", ".join("?" * len(group_ids))
+        self._write(f"DELETE FROM phone_groups WHERE group_id IN ({placeholders})", group_ids)
+
+    def _insert_phone_groups(self, rows):
+        with self.lock, self.conn:
+            self._execute(
+                "INSERT INTO phone_groups (group_id, phones) VALUES (?, ?)",
+                [(idx, json.dumps(group)) for idx, group in rows],
+                many=True,
+            )
+
+    # ----- 上传记录 -----
+    def page_upload_logs(self, user_id=None, start=None, end=None, before=None, limit=100):
+        filters = []
+        if user_id:
+            filters.append(("eq", "user_id", user_id))
+        if start:
+            filters.append(("gte", "upload_time", start))
+        if end:
+            filters.append(("lt", "upload_time", end))
+        clauses, params = self._where(filters)
+        if before:
+            t, last_id = before
+            clauses.append("(upload_time < ? OR (upload_time = ? AND id < ?))")
+            params += [t, t, int(last_id)]
+        sql = "SELECT id, user_id, phone, upload_time FROM upload_logs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY upload_time DESC, id DESC LIMIT ?"
+        return self._query(sql, params + [limit])
+
+    def _insert_upload_logs(self, uid, phones, upload_time):
+        if not phones:
+            return set()
+        values = ", ".join(["(?, ?, ?)"] * len(phones))
+        params = [v for p in phones for v in (uid, p, upload_time)]
+        with self.lock, self.conn:
+            rows = self._execute(
+                f"INSERT INTO upload_logs (user_id, phone, upload_time) VALUES {values}"
+                " ON CONFLICT (phone) DO NOTHING RETURNING phone",
+                params,
+            )
+        return {row["phone"] for row in rows}
+
+    def _find_in(self, table, phones):
+        phones = list(phones)
+        if not phones:
+            return set()
+        placeholders = ", ".join("?" * len(phones))
+        rows = self._query(
+            f"SELECT phone FROM {table} WHERE phone IN ({placeholders})", phones
+        )
+        return {row["phone"] for row in rows}
+
+    def find_uploaded(self, phones):
+        return self._find_in("upload_logs", phones)
+
+    # ----- 标记 / 黑名单 -----
+    def _get_marks(self, phones):
+        placeholders = ", ".join("?" * len(phones))
+        rows = self._query(
+            f"SELECT phone, status FROM mark_status WHERE phone IN ({placeholders})",
+            phones,
+        )
+        return {row["phone"]: row["status"] for row in rows}
+
+    def _set_marks(self, phones, status):
+        with self._rpc("set_marks") as call:
+            placeholders = ", ".join("?" * len(phones))
+            current = {
+                row["phone"]: row["status"]
+                for row in self._query(
+                    f"SELECT phone, status FROM mark_status WHERE phone IN ({placeholders})",
+                    phones,
+                )
+            }
+            result = {}
+            for phone in phones:
+                if status is not None:
+                    result[phone] = status
+                else:
+                    result[phone] = (
+                        UNMARKED if current.get(phone, UNMARKED) == MARKED else MARKED
+                    )
+            self._execute(
+                "INSERT INTO mark_status (phone, status) VALUES (?, ?)"
+                " ON CONFLICT (phone) DO UPDATE SET status = excluded.status",
+                list(result.items()),
+                many=True,
+            )
+            marked = [(p,) for p, s in result.items() if s == MARKED]
+            unmarked = [(p,) for p, s in result.items() if s != MARKED]
+            if marked:
+                self._execute(
+                    "INSERT OR IGNORE INTO blacklist (phone) VALUES (?)", marked, many=True
+                )
+            if unmarked:
+                self._execute(
+                    "DELETE FROM blacklist WHERE phone = ?", unmarked, many=True
+                )
+            call["result"] = result
+        return result
+
+    def save_blacklist(self, phones):
+        phones = list(phones)
+        with self.lock, self.conn:
+            self._execute("DELETE FROM blacklist")
+            self._execute(
+                "INSERT OR IGNORE INTO blacklist (phone) VALUES (?)",
+                [(phone,) for phone in phones],
+                many=True,
+            )
+        self._notify("blacklist_reset", phones)
+
+    def find_blacklisted(self, phones):
+        return self._find_in("blacklist", phones)
+
+    def blacklist_count(self):
+        return self._query("SELECT COUNT(*) AS n FROM blacklist")[0]["n"]
+
+    def pool_counts(self, day_start, day_end):
+        with self._rpc("pool_counts") as call:
+            call["result"] = result = self._query(
+                "SELECT"
+                " (SELECT COALESCE(SUM(json_array_length(phones)), 0) FROM phone_groups)"
+                " AS total_phones,"
+                " (SELECT COALESCE(SUM(json_array_length(phones)), 0) FROM phone_groups"
+                "  WHERE group_id IN (SELECT group_id FROM user_assignments))"
+                " AS assigned_phones,"
+                " (SELECT COUNT(*) FROM blacklist) AS blacklisted,"
+                " (SELECT COUNT(*) FROM upload_logs"
+                "  WHERE upload_time >= ? AND upload_time < ?) AS uploaded_today",
+                (day_start, day_end),
+            )[0]
+        return result
+
+    def blacklist_preview(self, n=10):
+        rows = self._query("SELECT phone FROM blacklist LIMIT ?", (n,))
+        return [row["phone"] for row in rows]
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+import time
+
+from postgrest import ReturnMethod
+from supabase import ClientOptions, create_client, Client
+
+from .base import Storage, utc_now_iso
+from .http_transport import create_http_client
+from .tracing import payload_size, record_call, tracing_active
+
+WRITE_OPS = ("insert", "upsert", "update", "delete")
+
+
+class TracedQuery:
+    """包装 PostgREST 查询构造器，在 execute() 时记录一次后端调用"""
+
+    def __init__(self, builder, table, op="select"):
+        self._builder = builder
+        self._table = table
+        self._op = op
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                op = name if name in WRITE_OPS else self._op
+                return TracedQuery(result, self._table, op)
+            return result
+
+        return call
+
+    def execute(self):
+        t0 = time.perf_counter()
+        data = None
+        try:
+            res = self._builder.execute()
+            data = getattr(res, "data", None)
+            return res
+        finally:
+            if tracing_active():
+                rows = len(data) if isinstance(data, list) else int(bool(data))
+                record_call(
+                    self._table,
+                    self._op,
+                    rows,
+                    payload_size(data),
+                    time.perf_counter() - t0,
+                )
+
+
+class SupabaseStorage(Storage):
+    """基于 Supabase (PostgREST) 的存储实现"""
+
+    def __init__(self, client: Client, transport=None):
+        self.client = client
+        self.transport = transport
+
+    @classmethod
+    def from_credentials(cls, url, key, transport_config=None):
+        """客户端走 http_transport 配置的连接池 / 超时 / 重试"""
+        http_client, transport = create_http_client(transport_config)
+        options = ClientOptions(httpx_client=http_client)
+        return cls(create_client(url, key, options=options), transport)
+
+    def transport_stats(self):
+        if self.transport is None:
+            return None
+        stats = self.transport.stats.snapshot()
+        stats["pool"] = self.transport.pool_snapshot()
+        return stats
+
+    def table(self, name):
+        return TracedQuery(self.client.table(name), name)
+
+    def rpc(self, name, params):
+        """调用 Postgres 函数（见 sql/ 目录）"""
+        return TracedQuery(self.client.rpc(name, params), name, "rpc")
+
+    # ----- 分页读取 -----
+    def iter_rows(self, table, columns, filters=(), page_size=None):
+        key = self.PAGE_KEYS[table]
+        page_size = page_size or self.PAGE_SIZE
+        cols = list(columns) + ([key] if key not in columns else [])
+        last = None
+        while True:
+            query = self.table(table).select(", ".join(cols))
+            for op, column, value in filters:
+                query = getattr(query, op)(column, value)
+            if last is not None:
+                query = query.gt(key, last)
+            rows = query.order(key).limit(page_size).execute().data or []
+            # 读到空页才结束：PostgREST 的 max-rows 小于 page_size 时每页都会"不满"，
+            # 按 len(rows) < page_size 判断会把结果截断
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][key]
+
+    # ----- 白名单 -----
+    def _insert_whitelist(self, ids):
+        self.table("whitelist").upsert(
+            [{"id": id_val} for id_val in ids],
+            on_conflict="id",
+            ignore_duplicates=True,
+            returning=ReturnMethod.minimal,
+        ).execute()
+
+    def _delete_whitelist(self, ids):
+        self.table("whitelist").delete().in_("id", list(ids)).execute()
+
+    # ----- 分配记录 -----
+    def get_user_assignments(self, uid):
+        response = (
+            self.table("user_assignments").select("*").eq("uid", uid).execute()
+        )
+        return [
+            {"group_id": item["group_id"], "assign_time": item["assign_time"]}
+            for item in response.data
+        ]
+
+    def get_last_assignment(self, uid):
+        res = (
+            self.table("user_assignments")
+            .select("*")
+            .eq("uid", uid)
+            .order("assign_time", desc=True)
+            .limit(1)
+            .execute()
+        )
+        data = getattr(res, "data", None) or []
+        return data[0] if data else None
+
+    def add_user_assignment(self, uid, group_id):
+        self.table("user_assignments").insert(
+            {"uid": uid, "group_id": group_id, "assign_time": utc_now_iso()}
+        ).execute()
+
+    def delete_user_assignments(self, uid):
+        self.table("user_assignments").delete().eq("uid", uid).execute()
+
+    def claim_next_group(self, uid, max_times, interval_seconds, candidates=()):
+        response = self.rpc(
+            "claim_next_group",
+            {
+                "p_uid": uid,
+                "p_max_times": max_times,
+                "p_interval_seconds": interval_seconds,
+                "p_candidates": list(candidates),
+            },
+        ).execute()
+        return response.data
+
+    # ----- 手机号组 -----
+    def _get_phone_groups(self, group_ids):
+        response = (
+            self.table("phone_groups")
+            .select("group_id, phones")
+            .in_("group_id", group_ids)
+            .execute()
+        )
+        return {
+            item["group_id"]: item["phones"]
+            for item in response.data or []
+            if item.get("phones")
+        }
+
+    def unassigned_group_page(self, after, limit):
+        response = self.rpc(
+            "unassigned_groups", {"p_after": after, "p_limit": limit}
+        ).execute()
+        return [(row["group_id"], row["phones"]) for row in response.data or []]
+
+    def _find_pooled(self, phones):
+        response = self.rpc("pooled_phones", {"p_phones": phones}).execute()
+        return {row["phone"]: row["group_id"] for row in response.data or []}
+
+    def _clear_phone_groups(self):
+        self.table("phone_groups").delete().neq("group_id", -1).execute()
+
+    def max_group_id(self):
+        response = (
+            self.table("phone_groups")
+            .select("group_id")
+            .order("group_id", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0]["group_id"] if response.data else -1
+
+    def _delete_phone_groups(self, group_ids):
+        self.table("phone_groups").delete().in_("group_id", list(group_ids)).execute()
+
+    def _insert_phone_groups(self, rows):
+        data = [{"group_id": idx, "phones": group} for idx, group in rows]
+        self.table("phone_groups").insert(data, returning=ReturnMethod.minimal).execute()
+
+    # ----- 上传记录 -----
+    def page_upload_logs(self, user_id=None, start=None, end=None, before=None, limit=100):
+        query = self.table("upload_logs").select("id, user_id, phone, upload_time")
+        if user_id:
+            query = query.eq("user_id", user_id)
+        if start:
+            query = query.gte("upload_time", start)
+        if end:
+            query = query.lt("upload_time", end)
+        if before:
+            t, last_id = before
+            query = query.or_(
+                f'upload_time.lt."{t}",and(upload_time.eq."{t}",id.lt.{int(last_id)})'
+            )
+        response = (
+            query.order("upload_time", desc=True)
+            .order("id", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return response.data or []
+
+    def _insert_upload_logs(self, uid, phones, upload_time):
+        data = [{"user_id": uid, "phone": p, "upload_time": upload_time} for p in phones]
+        response = (
+            self.table("upload_logs")
+            .upsert(data, on_conflict="phone", ignore_duplicates=True)
+            .execute()
+        )
+        return {row["phone"] for row in response.data or []}
+
+    def find_uploaded(self, phones):
+        response = (
+            self.table("upload_logs").select("phone").in_("phone", list(phones)).execute()
+        )
+        return {row["phone"] for row in response.data or []}
+
+    # ----- 标记 / 黑名单 -----
+    def _get_marks(self, phones):
+        response = (
+            self.table("mark_status").select("phone, status").in_("phone", phones).execute()
+        )
+        return {row["phone"]: row["status"] for row in response.data or []}
+
+    def _set_marks(self, phones, status):
+        response = self.rpc("set_marks", {"p_phones": phones, "p_status": status}).execute()
+        return response.data or {}
+
+    def save_blacklist(self, phones):
+        phones = list(phones)
+        # 清空表
+        self.table("blacklist").delete().neq("phone", "").execute()
+        # 插入新数据
+        if phones:
+            data = [{"phone": phone} for phone in phones]
+            self.table("blacklist").insert(data).execute()
+        self._notify("blacklist_reset", phones)
+
+    def find_blacklisted(self, phones):
+        response = (
+            self.table("blacklist").select("phone").in_("phone", list(phones)).execute()
+        )
+        return {row["phone"] for row in response.data or []}
+
+    def blacklist_count(self):
+        response = self.table("blacklist").select("phone", count="exact").execute()
+        return response.count
+
+    def pool_counts(self, day_start, day_end):
+        response = self.rpc(
+            "pool_counts", {"p_day_start": day_start, "p_day_end": day_end}
+        ).execute()
+        return response.data or {}
+
+    def blacklist_preview(self, n=10):
+        try:
+            response = self.table("blacklist").select("phone").limit(n).execute()
+            return [row["phone"] for row in response.data]
+        except Exception as e:
+            print("blacklist_preview 预览失败：", e)
+            return ["⚠️ 数据读取失败"]
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+已占用号码索引（upload_logs + blacklist），替代每次全表读取的 get_taken_phones()。
+
+- 启动后首次使用时全量加载一次
+- 本进程的写入通过存储层写入事件实时更新
+- 其他 worker 的上传按 upload_time 水位线增量拉取；黑名单没有时间列，定期整表刷新
+- 加载 / 刷新单飞：并发请求只有一个线程扫表，其余沿用旧快照（冷启动时等待首次加载）
+- 定期全量重建在后台线程中进行，建好后整体换入；期间请求继续用旧快照并照常增量刷新，
+  本进程在重建期间的写入事件在换入后重放
+- compact=True 时只保留 Bloom 过滤器：判定"不存在"直接返回，"可能存在"再回库精确确认，
+  适合数百万号码时压低常驻内存
+"""
+import hashlib
+import math
+import threading
+import time
+
+
+class BloomFilter:
+    """简单的 Bloom 过滤器（blake2b 双重哈希）"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class TakenPhoneIndex:
+    def __init__(
+        self,
+        storage,
+        compact=False,
+        refresh_seconds=5,
+        blacklist_refresh_seconds=60,
+        reseed_seconds=3600,
+    ):
+        self.storage = storage
+        self.compact = compact
+        self.refresh_seconds = refresh_seconds
+        self.blacklist_refresh_seconds = blacklist_refresh_seconds
+        self.reseed_seconds = reseed_seconds
+        self.lock = threading.Lock()
+        # 同一时间只有一个线程重建 / 增量刷新，其余线程继续用旧快照
+        self.refresh_lock = threading.Lock()
+        self.uploaded = set()
+        self.blacklisted = set()
+        self.bloom = None
+        self.watermark = None
+        self.seeded_at = None
+        self.reseeding = False
+        # 全量重建期间本进程的写入事件，换入新快照后重放；不在重建时为 None
+        self.pending_events = None
+        self.refreshed_at = 0.0
+        self.blacklist_refreshed_at = 0.0
+        storage.add_listener(self.on_write)
+
+    # ----- 加载与刷新 -----
+    def seed(self):
+        """全量加载（扫描在锁外进行），建好后换入"""
+        with self.lock:
+            self.pending_events = []
+        try:
+            uploaded = set()
+            watermark = None
+            for row in self.storage.iter_rows("upload_logs", ["phone", "upload_time"]):
+                if row.get("phone"):
+                    uploaded.add(row["phone"])
+                t = row.get("upload_time")
+                if t and (watermark is None or str(t) > watermark):
+                    watermark = str(t)
+            blacklist = self.storage.load_blacklist()
+            bloom = None
+            if self.compact:
+                bloom = BloomFilter(max(2 * (len(uploaded) + len(blacklist)), 100_000))
+                for phone in uploaded | blacklist:
+                    bloom.add(phone)
+                uploaded, blacklist = set(), set()
+        except BaseException:
+            with self.lock:
+                self.pending_events = None
+            raise
+        now = time.monotonic()
+        with self.lock:
+            events, self.pending_events = self.pending_events, None
+            self.watermark = watermark
+            self.bloom = bloom
+            self.uploaded, self.blacklisted = uploaded, set(blacklist)
+            self.seeded_at = self.refreshed_at = self.blacklist_refreshed_at = now
+            for event, phones in events:
+                self._apply(event, phones)
+
+    def refresh(self):
+        """增量同步其他 worker 的上传（按水位线），并按需刷新黑名单"""
+        if self.watermark is None:
+            rows = list(self.storage.iter_rows("upload_logs", ["phone", "upload_time"]))
+        else:
+            rows = self.storage.upload_phones_since(self.watermark)
+        now = time.monotonic()
+        blacklist = None
+        if now - self.blacklist_refreshed_at > self.blacklist_refresh_seconds:
+            blacklist = self.storage.load_blacklist()
+        with self.lock:
+            for row in rows:
+                self._add("uploaded", row.get("phone"))
+                t = row.get("upload_time")
+                if t and (self.watermark is None or str(t) > self.watermark):
+                    self.watermark = str(t)
+            if blacklist is not None:
+                self._reset_blacklist(blacklist)
+                self.blacklist_refreshed_at = now
+            self.refreshed_at = now
+
+    def _refresh_due(self):
+        return time.monotonic() - self.refreshed_at > self.refresh_seconds
+
+    def _background_reseed(self):
+        try:
+            self.seed()
+        except Exception as e:
+            print(f"⚠️ 已占用号码索引重建失败，继续使用旧索引: {e}")
+        finally:
+            with self.lock:
+                self.reseeding = False
+
+    def _maybe_refresh(self):
+        """
+        冷索引没有旧快照可用，只能等首次加载（单飞，并发请求只加载一次）；
+        到期的全量重建交给后台线程，请求本身只做增量刷新，拿不到 refresh_lock 就直接用旧快照。
+        """
+        if self.seeded_at is None:
+            with self.refresh_lock:
+                if self.seeded_at is None:
+                    self.seed()
+            return
+        if time.monotonic() - self.seeded_at > self.reseed_seconds:
+            with self.lock:
+                start = not self.reseeding
+                self.reseeding = True
+            if start:
+                threading.Thread(
+                    target=self._background_reseed, name="taken-phones-reseed", daemon=True
+                ).start()
+        if not self._refresh_due() or not self.refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if self._refresh_due():
+                self.refresh()
+        finally:
+            self.refresh_lock.release()
+
+    # ----- 写入事件 -----
+    def on_write(self, event, phones):
+        phones = list(phones)
+        with self.lock:
+            if self.pending_events is not None:
+                self.pending_events.append((event, phones))
+            if self.seeded_at is not None:
+                self._apply(event, phones)
+
+    def _apply(self, event, phones):
+        if event == "uploaded":
+            for phone in phones:
+                self._add("uploaded", phone)
+        elif event == "blacklisted":
+            for phone in phones:
+                self._add("blacklisted", phone)
+        elif event == "unblacklisted":
+            self.blacklisted.difference_update(phones)
+        elif event == "blacklist_reset":
+            self._reset_blacklist(phones)
+
+    def _add(self, kind, phone):
+        if not phone:
+            return
+        if self.compact:
+            self.bloom.add(phone)
+        elif kind == "uploaded":
+            self.uploaded.add(phone)
+        else:
+            self.blacklisted.add(phone)
+
+    def _reset_blacklist(self, phones):
+        if self.compact:
+            # Bloom 过滤器不支持删除，移出黑名单的号码由回库确认兜底
+            for phone in phones:
+                self.bloom.add(phone)
+        else:
+            self.blacklisted = set(phones)
+
+    # ----- 查询 -----
+    def find_taken(self, phones):
+        """返回给定号码中已被占用的部分"""
+        self._maybe_refresh()
+        with self.lock:
+            if not self.compact:
+                return {p for p in phones if p in self.uploaded or p in self.blacklisted}
+            maybe = [p for p in phones if p in self.bloom]
+        # Bloom 命中的号码回库精确确认
+        return self.storage.find_taken(maybe) if maybe else set()
+
+    def is_taken(self, phone):
+        return bool(self.find_taken([phone]))
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+后端调用追踪：记录每个请求内每次表调用的 表名 / 操作 / 行数 / 字节数 / 耗时，
+并按路由聚合，供调试响应头和管理后台查看。
+"""
+import contextvars
+import json
+import threading
+from collections import defaultdict
+
+_current_trace = contextvars.ContextVar("storage_trace", default=None)
+
+
+class Trace:
+    """单个请求内的全部后端调用"""
+
+    def __init__(self):
+        self.calls = []
+
+    def record(self, table, op, rows, nbytes, duration):
+        self.calls.append(
+            {
+                "table": table,
+                "op": op,
+                "rows": rows,
+                "bytes": nbytes,
+                "ms": duration * 1000,
+            }
+        )
+
+    @property
+    def round_trips(self):
+        return len(self.calls)
+
+    def summary(self):
+        return {
+            "round_trips": self.round_trips,
+            "ms": sum(c["ms"] for c in self.calls),
+            "rows": sum(c["rows"] for c in self.calls),
+            "bytes": sum(c["bytes"] for c in self.calls),
+        }
+
+    def header_value(self):
+        s = self.summary()
+        return (
+            f"calls={s['round_trips']}; ms={s['ms']:.2f}; "
+            f"rows={s['rows']}; bytes={s['bytes']}"
+        )
+
+
+def start_trace():
+    """开始追踪当前上下文，返回 (trace, token)"""
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+
+def resume_trace(trace):
+    """在另一段执行中（如流式响应体）继续记录到已有 trace，返回 token"""
+    return _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def tracing_active():
+    return _current_trace.get() is not None
+
+
+# 长列表只编码前这么多项，再按条数外推，避免每次调用都把整批结果序列化一遍
+SIZE_SAMPLE = 16
+
+
+def _json_size(data):
+    return len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def payload_size(data):
+    """估算返回数据的字节数（按 JSON 编码计算；长列表抽样外推，开销与结果大小无关）"""
+    if data is None:
+        return 0
+    try:
+        if isinstance(data, (list, tuple)) and len(data) > SIZE_SAMPLE:
+            sample = _json_size(list(data[:SIZE_SAMPLE]))
+            return sample * len(data) // SIZE_SAMPLE
+        return _json_size(data)
+    except (TypeError, ValueError):
+        return 0
+
+
+def record_call(table, op, rows, nbytes, duration):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(table, op, rows, nbytes, duration)
+
+
+class RouteStats:
+    """按路由聚合各请求的后端调用情况（线程安全）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def add(self, route, trace):
+        s = trace.summary()
+        with self.lock:
+            entry = self.routes.get(route)
+            if entry is None:
+                entry = self.routes[route] = {
+                    "requests": 0,
+                    "round_trips": 0,
+                    "max_round_trips": 0,
+                    "ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "bytes": 0,
+                    "tables": defaultdict(lambda: {"calls": 0, "rows": 0, "ms": 0.0}),
+                }
+            entry["requests"] += 1
+            entry["round_trips"] += s["round_trips"]
+            entry["max_round_trips"] = max(entry["max_round_trips"], s["round_trips"])
+            entry["ms"] += s["ms"]
+            entry["max_ms"] = max(entry["max_ms"], s["ms"])
+            entry["rows"] += s["rows"]
+            entry["bytes"] += s["bytes"]
+            for call in trace.calls:
+                t = entry["tables"][f"{call['table']}.{call['op']}"]
+                t["calls"] += 1
+                t["rows"] += call["rows"]
+                t["ms"] += call["ms"]
+
+    def snapshot(self):
+        """按平均往返次数从高到低返回各路由的统计"""
+        with self.lock:
+            result = []
+            for route, e in self.routes.items():
+                n = e["requests"]
+                result.append(
+                    {
+                        "route": route,
+                        "requests": n,
+                        "avg_round_trips": e["round_trips"] / n,
+                        "max_round_trips": e["max_round_trips"],
+                        "avg_ms": e["ms"] / n,
+                        "max_ms": e["max_ms"],
+                        "avg_rows": e["rows"] / n,
+                        "avg_bytes": e["bytes"] / n,
+                        "tables": {
+                            key: {
+                                "calls_per_request": t["calls"] / n,
+                                "rows_per_request": t["rows"] / n,
+                                "ms_per_request": t["ms"] / n,
+                            }
+                            for key, t in sorted(e["tables"].items())
+                        },
+                    }
+                )
+        result.sort(key=lambda r: (r["avg_round_trips"], r["avg_ms"]), reverse=True)
+        return result
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()